@@ -1,21 +1,107 @@
-import numba
-import numpy as np
+import importlib
+import time
 
+from src.log import log
 
-@numba.njit(fastmath=True)
-def levenshtein_distance(a: str, b: str):
+_backend = None
+
+
+class PythonAlgorithms:
+    """Pure Python implementation of algorithms that is used if numba is not available"""
+
+    @staticmethod
+    def levenshtein_distance(a, b, max_distance):
+        """Myers/Hyyrö bit-parallel algorithm (Python integers are not limited by machine word size)"""
+        if len(a) > len(b):
+            a, b = b, a
+        m = len(a)
+        n = len(b)
+        if max_distance >= 0 and n - m > max_distance:
+            return max_distance + 1
+        if m == 0:
+            return n
+        peq = dict()
+        for i, c in enumerate(a):
+            peq[c] = peq.get(c, 0) | (1 << i)
+        mask = (1 << m) - 1
+        last = 1 << (m - 1)
+        pv = mask
+        mv = 0
+        score = m
+        for j, c in enumerate(b):
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & mask)
+            mh = pv & xh
+            if ph & last:
+                score += 1
+            elif mh & last:
+                score -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = mh | (~(xv | ph) & mask)
+            mv = ph & xv
+            if max_distance >= 0 and score - (n - j - 1) > max_distance:
+                return max_distance + 1
+        return score
+
+    @staticmethod
+    def encode_words(words):
+        return list(words)
+
+    @staticmethod
+    def levenshtein_distance_batch(query, encoded_words, max_distance):
+        return [PythonAlgorithms.levenshtein_distance(query, word, max_distance) for word in encoded_words]
+
+    @staticmethod
+    def precompile():
+        return 0, 0, None
+
+
+def get_backend():
+    """Get implementation of algorithms. Numba is imported on first call"""
+    global _backend
+    if _backend is None:
+        try:
+            _backend = importlib.import_module("src.algorithms_numba")
+        except ImportError as e:
+            log.warning(f"Numba is not available ({e}), pure Python implementation of algorithms is used")
+            _backend = PythonAlgorithms
+    return _backend
+
+
+def levenshtein_distance(a: str, b: str, max_distance=-1):
     """
-    Calculates Levenshtein distance between two strings using dynamic programming.
-    Complexity: O(len(a) * len(b))
+    Calculates Levenshtein distance between two strings.
+    Bit-parallel algorithm is used if the shorter string is not longer than 64 characters,
+    otherwise dynamic programming with two rows is used.
+    If max_distance is not negative and distance exceeds it, max_distance + 1 is returned (computation stops early)
     """
-    m = len(a)
-    n = len(b)
-    d = np.zeros((m + 1, n + 1), dtype=np.uintc)
-    for i in range(m + 1):
-        d[i, 0] = i
-    for j in range(n + 1):
-        d[0, j] = j
-    for j in range(1, n + 1):
-        for i in range(1, m + 1):
-            d[i, j] = min(d[i-1, j] + 1, d[i, j-1] + 1, d[i-1, j-1] + int(a[i-1] != b[j-1]))
-    return d[m, n]
+    return get_backend().levenshtein_distance(a, b, max_distance)
+
+
+def encode_words(words):
+    """Pack words for levenshtein_distance_batch"""
+    return get_backend().encode_words(words)
+
+
+def levenshtein_distance_batch(query, encoded_words, max_distance=-1):
+    """
+    Calculates Levenshtein distances from query to every word in a single JIT call.
+    encoded_words is a result of encode_words(). Result is a sequence of distances.
+    If max_distance is not negative, distances that exceed it are returned as max_distance + 1
+    """
+    return get_backend().levenshtein_distance_batch(query, encoded_words, max_distance)
+
+
+def precompile():
+    """Import and compile JIT functions (compiled code is loaded from on-disk cache if possible)"""
+    start = time.perf_counter()
+    hits, misses, compile_time = get_backend().precompile()
+    elapsed = time.perf_counter() - start
+    if misses:
+        log.info(f"JIT functions are compiled in {elapsed:.2f}s and cached for next starts")
+    elif hits:
+        saved = f", saved {compile_time - elapsed:.2f}s compared to compilation" if compile_time is not None else ""
+        log.info(f"JIT functions are loaded from cache in {elapsed:.2f}s{saved}")
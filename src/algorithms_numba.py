@@ -0,0 +1,185 @@
+"""
+Numba implementation of algorithms. Use functions from src.algorithms that load this module on first use.
+Compiled functions are cached on disk (see cache=True), so only the first start after code change compiles them
+"""
+
+import os
+import time
+
+import numba
+import numpy as np
+
+# Bit-parallel algorithm is used if the shorter string fits into 64-bit machine word
+BIT_PARALLEL_MAX_LENGTH = 64
+
+
+@numba.njit(fastmath=True, cache=True)
+def levenshtein_distance_matrix(a: str, b: str):
+    """
+    Calculates Levenshtein distance between two strings using dynamic programming.
+    Complexity: O(len(a) * len(b)), memory: O(len(a) * len(b))
+    Reference implementation, use levenshtein_distance instead
+    """
+    m = len(a)
+    n = len(b)
+    d = np.zeros((m + 1, n + 1), dtype=np.uintc)
+    for i in range(m + 1):
+        d[i, 0] = i
+    for j in range(n + 1):
+        d[0, j] = j
+    for j in range(1, n + 1):
+        for i in range(1, m + 1):
+            d[i, j] = min(d[i-1, j] + 1, d[i, j-1] + 1, d[i-1, j-1] + int(a[i-1] != b[j-1]))
+    return d[m, n]
+
+
+@numba.njit(fastmath=True, cache=True)
+def _to_codes(s):
+    codes = np.empty(len(s), dtype=np.uint32)
+    for i in range(len(s)):
+        codes[i] = ord(s[i])
+    return codes
+
+
+@numba.njit(fastmath=True, cache=True)
+def _pattern_masks(pattern):
+    """Bit masks of positions for every distinct character of pattern (keys are sorted for binary search)"""
+    keys = np.unique(pattern)
+    masks = np.zeros(len(keys), dtype=np.uint64)
+    for i in range(len(pattern)):
+        masks[np.searchsorted(keys, pattern[i])] |= np.uint64(1) << np.uint64(i)
+    return keys, masks
+
+
+@numba.njit(fastmath=True, cache=True)
+def _bit_parallel(keys, masks, m, text, n, max_distance):
+    """
+    Myers/Hyyrö bit-parallel algorithm. Pattern length m must be in range [1, 64].
+    Complexity: O(len(text) * log(alphabet of pattern))
+    """
+    one = np.uint64(1)
+    pv = ~np.uint64(0)
+    mv = np.uint64(0)
+    last = one << np.uint64(m - 1)
+    score = m
+    for j in range(n):
+        k = np.searchsorted(keys, text[j])
+        eq = masks[k] if k < len(keys) and keys[k] == text[j] else np.uint64(0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << one) | one
+        mh = mh << one
+        pv = mh | ~(xv | ph)
+        mv = ph & xv
+        # Distance can not decrease by more than number of remaining characters
+        if max_distance >= 0 and score - (n - j - 1) > max_distance:
+            return max_distance + 1
+    return score
+
+
+@numba.njit(fastmath=True, cache=True)
+def _two_rows(a, m, b, n, max_distance):
+    """
+    Dynamic programming that keeps only two rows of the matrix.
+    Complexity: O(len(a) * len(b)), memory: O(len(b))
+    """
+    prev = np.arange(n + 1)
+    cur = np.empty(n + 1, dtype=prev.dtype)
+    for i in range(1, m + 1):
+        cur[0] = i
+        row_min = i
+        for j in range(1, n + 1):
+            cur[j] = min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + (a[i-1] != b[j-1]))
+            row_min = min(row_min, cur[j])
+        if max_distance >= 0 and row_min > max_distance:
+            return max_distance + 1
+        prev, cur = cur, prev
+    if max_distance >= 0:
+        return min(prev[n], max_distance + 1)
+    return prev[n]
+
+
+@numba.njit(fastmath=True, cache=True)
+def _distance(a, b, max_distance):
+    m = len(a)
+    n = len(b)
+    if m > n:
+        a, b, m, n = b, a, n, m
+    if max_distance >= 0 and n - m > max_distance:
+        return max_distance + 1
+    if m == 0:
+        return n
+    if m <= BIT_PARALLEL_MAX_LENGTH:
+        keys, masks = _pattern_masks(a)
+        return _bit_parallel(keys, masks, m, b, n, max_distance)
+    return _two_rows(a, m, b, n, max_distance)
+
+
+@numba.njit(fastmath=True, cache=True)
+def levenshtein_distance(a: str, b: str, max_distance: int):
+    return _distance(_to_codes(a), _to_codes(b), max_distance)
+
+
+@numba.njit(fastmath=True, cache=True)
+def _distance_batch(query, codes, lengths, max_distance):
+    result = np.empty(len(lengths), dtype=np.int64)
+    m = len(query)
+    keys, masks = _pattern_masks(query[:BIT_PARALLEL_MAX_LENGTH])
+    for i in range(len(lengths)):
+        n = lengths[i]
+        if max_distance >= 0 and abs(n - m) > max_distance:
+            result[i] = max_distance + 1
+        elif m == 0:
+            result[i] = n
+        elif m <= BIT_PARALLEL_MAX_LENGTH:
+            result[i] = _bit_parallel(keys, masks, m, codes[i, :n], n, max_distance)
+        else:
+            result[i] = _distance(query, codes[i, :n], max_distance)
+    return result
+
+
+def encode_words(words):
+    """Pack words into array of character codes (padded with zeros) and array of lengths"""
+    lengths = np.array([len(word) for word in words], dtype=np.int64)
+    codes = np.zeros((len(words), lengths.max() if len(words) else 0), dtype=np.uint32)
+    for i, word in enumerate(words):
+        codes[i, :len(word)] = np.frombuffer(word.encode("utf-32-le"), dtype=np.uint32)
+    return codes, lengths
+
+
+def levenshtein_distance_batch(query, encoded_words, max_distance):
+    codes, lengths = encoded_words
+    return _distance_batch(
+        np.frombuffer(query.encode("utf-32-le"), dtype=np.uint32), codes, lengths, max_distance)
+
+
+def precompile():
+    """Compile JIT functions or load them from on-disk cache.
+    Returns number of functions loaded from cache, number of compiled functions and last known compilation time"""
+    start = time.perf_counter()
+    levenshtein_distance("", "", -1)
+    levenshtein_distance_batch("", encode_words([""]), -1)
+    elapsed = time.perf_counter() - start
+    dispatchers = [obj for obj in globals().values() if isinstance(obj, numba.core.registry.CPUDispatcher)]
+    hits = sum(sum(dispatcher.stats.cache_hits.values()) for dispatcher in dispatchers)
+    misses = sum(sum(dispatcher.stats.cache_misses.values()) for dispatcher in dispatchers)
+    # Remember compilation time, so the time saved by cache can be reported on next start
+    compile_time_path = os.path.join(levenshtein_distance.stats.cache_path, "compile_time")
+    compile_time = None
+    try:
+        if misses:
+            compile_time = elapsed
+            with open(compile_time_path, 'w') as f:
+                f.write(str(compile_time))
+        elif os.path.isfile(compile_time_path):
+            with open(compile_time_path, 'r') as f:
+                compile_time = float(f.read())
+    except (OSError, ValueError):
+        pass
+    return hits, misses, compile_time
@@ -3,17 +3,13 @@ import datetime
 import importlib
 import itertools
 import os
-import re
-import signal
 import sys
 import time
 
 import discord
-import psutil
 
-from src import const
-from src.algorithms import levenshtein_distance
-from src.config import Config, GuildSettings, SecretConfig, User, bc
+from src import algorithms, const, process
+from src.config import Config, GuildSettings, SecretConfig, bc
 from src.info import BotInfo
 from src.log import log
 from src.markov import Markov
@@ -26,13 +22,15 @@ from src.utils import Util
 
 class WalBot(discord.Client):
     def __init__(self, config, secret_config):
-        super().__init__()
+        super().__init__(**Util.get_discord_client_options(config.discord_client["lean"]))
         self.repl = None
         self.config = config
         self.secret_config = secret_config
         self.loop.create_task(self.config_autosave())
+        self.loop.create_task(self.changelog_autoflush())
         self.loop.create_task(self.process_reminders())
         self.loop.create_task(self._precompile())
+        self.loop.create_task(self._build_emoji_index())
         bc.config = self.config
         bc.commands = self.config.commands
         bc.background_loop = self.loop
@@ -44,17 +42,34 @@ class WalBot(discord.Client):
         bc.secret_config = self.secret_config
         bc.message_buffer = MessageBuffer()
         bc.info = BotInfo()
+        bc.images.refresh()
         if not bc.args.fast_start:
             if bc.markov.check():
                 log.info("Markov model has passed all checks")
             else:
                 log.info("Markov model has not passed checks, but all errors were fixed")
 
+    async def close(self):
+        await bc.http.close()
+        await super().close()
+
     async def _precompile(self):
         log.debug("Started precompiling functions...")
-        levenshtein_distance("", "")
+        # Numba import and compilation do not block the event loop
+        await self.loop.run_in_executor(None, algorithms.precompile)
         log.debug("Finished precompiling functions")
 
+    async def _build_emoji_index(self):
+        await self.wait_until_ready()
+        if bc.emoji_index.is_available():
+            return
+        log.info("Emoji index is not found, building it in background...")
+        built = await self.loop.run_in_executor(
+            None, importlib.import_module("tools.emojis").build, const.EMOJI_CHART_URL, const.EMOJI_INDEX_PATH)
+        if not built:
+            log.warning("Emoji index is not built, Unicode emojis are not available in !img. "
+                        "Build it using: python walbot.py emojis")
+
     async def change_status(self, string, type_):
         await self.change_presence(activity=discord.Activity(name=string, type=type_))
 
@@ -68,39 +83,80 @@ class WalBot(discord.Client):
             index += 1
             await asyncio.sleep(self.config.saving["period"] * 60)
 
+    async def changelog_autoflush(self):
+        await self.wait_until_ready()
+        while not self.is_closed():
+            await asyncio.sleep(self.config.saving["changelog"]["period"])
+            await self.loop.run_in_executor(None, bc.changelog.flush)
+
     async def process_reminders(self):
         await self.wait_until_ready()
+        bc.reminder_scheduler.rebuild(self.config.reminders)
         while not self.is_closed():
-            log.debug3("Reminder processing iteration has started")
-            now = datetime.datetime.now().replace(second=0).strftime(const.REMINDER_TIME_FORMAT)
-            to_remove = []
-            to_append = []
-            for key, rem in self.config.reminders.items():
-                if rem == now:
-                    channel = self.get_channel(rem.channel_id)
-                    await channel.send(f"{' '.join(rem.ping_users)}\nYou asked to remind at {now} -> {rem.message}")
-                    for user_id in rem.whisper_users:
-                        await Msg.send_direct_message(
-                            self.get_user(user_id), f"You asked to remind at {now} -> {rem.message}", False)
-                    if rem.repeat_after > 0:
-                        new_time = datetime.datetime.now().replace(
-                            second=0, microsecond=0) + datetime.timedelta(minutes=rem.repeat_after)
-                        new_time = new_time.strftime(const.REMINDER_TIME_FORMAT)
-                        to_append.append(Reminder(str(new_time), rem.message, rem.channel_id))
-                        to_append[-1].repeat_after = rem.repeat_after
-                        log.debug2(f"Scheduled renew of recurring reminder - old id: {key}")
-                    to_remove.append(key)
-                elif rem < now:
-                    log.debug2(f"Scheduled reminder with id {key} removal")
-                    to_remove.append(key)
-            for key in to_remove:
-                self.config.reminders.pop(key)
-            for item in to_append:
-                key = self.config.ids["reminder"]
-                self.config.reminders[key] = item
-                self.config.ids["reminder"] += 1
-            log.debug3("Reminder processing iteration has finished")
-            await asyncio.sleep(const.REMINDER_POLLING_INTERVAL)
+            now = time.time()
+            for key, due_time in bc.reminder_scheduler.pop_due(now):
+                try:
+                    await self.send_reminder(key, now - due_time)
+                except Exception:
+                    log.error(f"Failed to send reminder {key}", exc_info=True)
+            # Reminder times are wall clock times, but sleep uses monotonic clock, so wall clock is rechecked
+            # periodically in case it is adjusted
+            delay = const.REMINDER_CLOCK_CHECK_INTERVAL
+            next_time = bc.reminder_scheduler.next_due_time()
+            if next_time is not None:
+                delay = max(0, min(delay, next_time - time.time()))
+            await bc.reminder_scheduler.wait(delay)
+
+    async def send_reminder(self, key, delay):
+        rem = self.config.reminders.pop(key, None)
+        if rem is None:
+            return
+        bc.changelog.delete(("reminders", key))
+        if rem.repeat_after > 0:
+            # Instances that were missed while bot was offline are skipped
+            new_rem = Reminder(rem.get_next_time(datetime.datetime.now()), rem.message, rem.channel_id)
+            new_rem.repeat_after = rem.repeat_after
+            new_key = self.config.ids["reminder"]
+            self.config.reminders[new_key] = new_rem
+            self.config.ids["reminder"] += 1
+            bc.changelog.set(("reminders", new_key), new_rem)
+            bc.changelog.set(("ids", "reminder"), self.config.ids["reminder"])
+            bc.reminder_scheduler.schedule(new_key, new_rem)
+            log.debug2(f"Scheduled renew of recurring reminder - old id: {key}, new id: {new_key}")
+        if delay > const.REMINDER_MISSED_TIMEOUT:
+            log.info(f"Reminder {key} at {rem.time} is missed by {int(delay)}s, it is not sent")
+            return
+        text = f"You asked to remind at {rem.time} -> {rem.message}"
+        if delay >= const.REMINDER_DELAY_NOTICE_THRESHOLD:
+            text += f"\n(this reminder is delayed by {datetime.timedelta(seconds=int(delay))})"
+        channel = self.get_channel(rem.channel_id)
+        if channel is None:
+            log.warning(f"Channel {rem.channel_id} of reminder {key} is not found")
+        else:
+            try:
+                await channel.send(f"{' '.join(rem.ping_users)}\n{text}")
+            except discord.HTTPException:
+                log.error(f"Failed to send reminder {key} to channel {rem.channel_id}", exc_info=True)
+        for user_id in rem.whisper_users:
+            user = await self.resolve_user(user_id)
+            if user is None:
+                log.warning(f"User {user_id} of reminder {key} is not found")
+                continue
+            try:
+                await Msg.send_direct_message(user, text, False)
+            except discord.HTTPException:
+                log.error(f"Failed to send reminder {key} to user {user_id}", exc_info=True)
+
+    async def resolve_user(self, user_id):
+        """Get user from cache or from Discord API (users are not cached in lean mode).
+        Returns None if user is not found"""
+        user = self.get_user(user_id)
+        if user is None:
+            try:
+                user = await self.fetch_user(user_id)
+            except discord.HTTPException as e:
+                log.warning(f"Failed to fetch user {user_id}: {e}")
+        return user
 
     async def on_ready(self):
         log.info(f"Logged in as: {self.user.name} {self.user.id} ({self.__class__.__name__})")
@@ -124,9 +180,7 @@ class WalBot(discord.Client):
             if self.config.guilds[message.channel.guild.id].is_whitelisted:
                 if message.channel.id not in self.config.guilds[message.channel.guild.id].whitelist:
                     return
-            if message.author.id not in self.config.users.keys():
-                self.config.users[message.author.id] = User(message.author.id)
-            if self.config.users[message.author.id].permission_level < 0:
+            if self.config.get_user(message.author.id).permission_level < 0:
                 return
             if message.content.startswith(self.config.commands_prefix):
                 await self.process_command(message)
@@ -139,9 +193,9 @@ class WalBot(discord.Client):
     async def process_repetitions(self, message):
         m = tuple(bc.message_buffer.get(message.channel.id, i) for i in range(3))
         if (all(m) and m[0].content == m[1].content == m[2].content and
-            (m[0].author.id != self.user.id and
-             m[1].author.id != self.user.id and
-             m[2].author.id != self.user.id)):
+            (m[0].author_id != self.user.id and
+             m[1].author_id != self.user.id and
+             m[2].author_id != self.user.id)):
             await message.channel.send(m[0].content)
 
     async def process_regular_message(self, message):
@@ -153,18 +207,24 @@ class WalBot(discord.Client):
                 await message.channel.send(message.author.mention + ' ' + result)
         elif message.channel.id in self.config.guilds[message.channel.guild.id].markov_logging_whitelist:
             bc.markov.add_string(message.content)
+        max_match_time = self.config.regex_safety["max_match_time"]
         if message.channel.id in self.config.guilds[message.channel.guild.id].responses_whitelist:
-            for response in self.config.responses.values():
-                if re.search(response.regex, message.content):
-                    await Msg.response(message, response.text, False)
+            for response in bc.responses_matcher.match(self.config.responses, message.content, max_match_time):
+                await Msg.response(message, response.text, False)
+            await self.report_disabled_triggers(message, "response", bc.responses_matcher)
         if message.channel.id in self.config.guilds[message.channel.guild.id].reactions_whitelist:
-            for reaction in self.config.reactions.values():
-                if re.search(reaction.regex, message.content):
-                    log.info("Added reaction " + reaction.emoji)
-                    try:
-                        await message.add_reaction(reaction.emoji)
-                    except discord.HTTPException:
-                        pass
+            for reaction in bc.reactions_matcher.match(self.config.reactions, message.content, max_match_time):
+                log.info("Added reaction " + reaction.emoji)
+                try:
+                    await message.add_reaction(reaction.emoji)
+                except discord.HTTPException:
+                    pass
+            await self.report_disabled_triggers(message, "reaction", bc.reactions_matcher)
+
+    async def report_disabled_triggers(self, message, kind, matcher):
+        for index, entry, reason in matcher.pop_disabled():
+            bc.changelog.set((kind + "s", index), entry)
+            await message.channel.send(f"{kind.capitalize()} {index} is disabled: {reason}. Use !upd{kind} to fix it")
 
     async def process_command(self, message):
         command = message.content.split(' ')
@@ -177,26 +237,20 @@ class WalBot(discord.Client):
             if command[0] in self.config.commands.aliases.keys():
                 command[0] = self.config.commands.aliases[command[0]]
             else:
-                await message.channel.send(
-                    f"Unknown command '{command[0]}', "
-                    f"probably you meant '{self.suggest_similar_command(command[0])}'")
+                await message.channel.send(self.config.commands.get_unknown_command_message(command[0]))
                 return
-        await self.config.commands.data[command[0]].run(message, command, self.config.users[message.author.id])
-
-    def suggest_similar_command(self, unknown_command):
-        min_dist = 100000
-        suggestion = ""
-        for command in self.config.commands.data.keys():
-            dist = levenshtein_distance(unknown_command, command)
-            if dist < min_dist:
-                suggestion = command
-                min_dist = dist
-        for command in self.config.commands.aliases.keys():
-            dist = levenshtein_distance(unknown_command, command)
-            if dist < min_dist:
-                suggestion = command
-                min_dist = dist
-        return suggestion
+        user = self.config.get_user(message.author.id)
+        throttled = bc.rate_limiter.acquire(
+            self.config.rate_limit, command[0], user, message.channel.id, message.channel.guild.id)
+        if throttled is not None:
+            scope, warn = throttled
+            bc.stats.record_throttled(command[0])
+            log.debug(f"Command '{command[0]}' from {message.author} is throttled (limit for {scope})")
+            if warn and self.config.rate_limit["reply"]:
+                await message.channel.send(
+                    f"Slow down, {message.author.mention}! Too many commands (limit for {scope})")
+            return
+        await self.config.commands.data[command[0]].run(message, command, user)
 
     async def on_raw_message_edit(self, payload):
         try:
@@ -209,25 +263,9 @@ class WalBot(discord.Client):
         log.info(f"<{payload.message_id}> (delete)")
 
 
-def parse_bot_cache():
-    pid = None
-    if os.path.exists(const.BOT_CACHE_FILE_PATH):
-        cache = None
-        with open(const.BOT_CACHE_FILE_PATH, 'r') as f:
-            cache = f.read()
-        if cache is not None:
-            try:
-                pid = int(cache)
-            except ValueError:
-                log.warning("Could not read pid from .bot_cache")
-                os.remove(const.BOT_CACHE_FILE_PATH)
-    return pid
-
-
-def start(args, main_bot=True):
+def start(args):
     # Check whether bot is already running
-    pid = parse_bot_cache()
-    if pid is not None and psutil.pid_exists(pid):
+    if process.is_running():
         log.error("Bot is already running!")
         return
     # Some variable initializations
@@ -235,24 +273,11 @@ def start(args, main_bot=True):
     secret_config = None
     bc.restart_flag = False
     bc.args = args
-    # Handle --nohup flag
-    if sys.platform in ("linux", "darwin") and args.nohup:
-        fd = os.open(const.NOHUP_FILE_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
-        log.info(f"Output is redirected to {const.NOHUP_FILE_PATH}")
-        os.dup2(fd, sys.stdout.fileno())
-        os.dup2(sys.stdout.fileno(), sys.stderr.fileno())
-        os.close(fd)
-        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    process.setup_nohup(args)
     # Selecting YAML parser
     bc.yaml_loader, bc.yaml_dumper = Util.get_yaml(verbose=True)
-    # Saving application pd in order to safely stop it later
-    with open(const.BOT_CACHE_FILE_PATH, 'w') as f:
-        f.write(str(os.getpid()))
-    # Executing patch tool if it is necessary
-    if args.patch:
-        cmd = f"'{sys.executable}' '{os.path.dirname(__file__) + '/../tools/patch.py'}' all"
-        log.info("Executing patch tool: " + cmd)
-        os.system(cmd)
+    process.write_bot_cache()
+    process.run_patch_tool(args)
     # Read configuration files
     config = Util.read_config_file(const.CONFIG_PATH)
     if config is None:
@@ -287,11 +312,13 @@ def start(args, main_bot=True):
                              ])
     if not ok:
         sys.exit(1)
+    # Apply changes that were not saved to config.yaml before last shutdown
+    bc.changelog.open(const.CONFIG_CHANGELOG_PATH, config.saving["changelog"]["enabled"])
+    replayed = bc.changelog.replay(config)
+    if replayed:
+        log.info(f"Replayed {replayed} change(s) from {const.CONFIG_CHANGELOG_PATH}")
     # Constructing bot instance
-    if main_bot:
-        walbot = WalBot(config, secret_config)
-    else:
-        walbot = importlib.import_module("src.minibot").MiniWalBot(config, secret_config)
+    walbot = WalBot(config, secret_config)
     # Checking authentication token
     if secret_config.token is None:
         secret_config.token = input("Enter your token: ")
@@ -303,8 +330,8 @@ def start(args, main_bot=True):
         event.cancel()
     bc.background_loop = None
     log.info("Bot is disconnected!")
-    if main_bot:
-        config.save(const.CONFIG_PATH, const.MARKOV_PATH, const.SECRET_CONFIG_PATH, wait=True)
+    bc.changelog.flush()
+    config.save(const.CONFIG_PATH, const.MARKOV_PATH, const.SECRET_CONFIG_PATH, wait=True)
     os.remove(const.BOT_CACHE_FILE_PATH)
     if bc.restart_flag:
         cmd = f"'{sys.executable}' '{os.path.dirname(__file__) + '/../walbot.py'}' start"
@@ -318,22 +345,3 @@ def start(args, main_bot=True):
                 sys.exit(0)
         else:
             os.system(cmd)
-
-
-def stop(_):
-    if not os.path.exists(const.BOT_CACHE_FILE_PATH):
-        log.error("Could not stop the bot (cache file does not exist)")
-        return
-    pid = parse_bot_cache()
-    if pid is None:
-        log.error("Could not stop the bot (cache file does not contain pid)")
-        return
-    if psutil.pid_exists(pid):
-        os.kill(pid, signal.SIGINT)
-        while psutil.pid_exists(pid):
-            log.debug("Bot is still running. Please, wait...")
-            time.sleep(0.5)
-        log.info("Bot is stopped!")
-    else:
-        log.error("Could not stop the bot (bot is not running)")
-        os.remove(const.BOT_CACHE_FILE_PATH)
@@ -0,0 +1,59 @@
+import contextvars
+import time
+
+from src import const
+
+
+class ExecutionBudgetExceeded(Exception):
+    """Raised when command invocation exceeds its execution budget"""
+    pass
+
+
+class ExecutionBudget:
+    """Limits for single command invocation including all nested subcommands"""
+
+    __slots__ = ("max_expansions", "max_depth", "max_length", "time_slice", "expansions", "depth", "deadline")
+
+    def __init__(self, max_expansions, max_depth, max_length, time_slice):
+        self.max_expansions = max_expansions
+        self.max_depth = max_depth
+        self.max_length = max_length
+        self.time_slice = time_slice
+        self.expansions = 0
+        self.depth = 0
+        self.deadline = time.monotonic() + time_slice
+
+    @staticmethod
+    def for_user(config, user):
+        """Get budget for user from config. Invocations without user (e.g. background events) get the lowest one"""
+        limits = config.execution_budget
+        level = user.permission_level if user is not None else const.Permission.USER.value
+        levels = [key for key in limits.keys() if key <= level]
+        return ExecutionBudget(**limits[max(levels) if levels else min(limits.keys())])
+
+    def enter(self):
+        self.depth += 1
+        if self.depth > self.max_depth:
+            raise ExecutionBudgetExceeded(f"maximum nesting depth ({self.max_depth}) is exceeded")
+        self.check_time()
+
+    def leave(self):
+        self.depth -= 1
+
+    def expand(self):
+        self.expansions += 1
+        if self.expansions > self.max_expansions:
+            raise ExecutionBudgetExceeded(f"maximum number of expansions ({self.max_expansions}) is exceeded")
+        self.check_time()
+
+    def check_length(self, string):
+        if string is not None and len(string) > self.max_length:
+            raise ExecutionBudgetExceeded(f"maximum string length ({self.max_length}) is exceeded")
+
+    def check_time(self):
+        if time.monotonic() > self.deadline:
+            raise ExecutionBudgetExceeded(f"time slice ({self.time_slice}s) is exceeded")
+
+
+# Budget of command invocation that is currently processed in this asyncio task
+current_budget = contextvars.ContextVar("current_budget", default=None)
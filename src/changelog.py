@@ -0,0 +1,103 @@
+import os
+import threading
+
+import yaml
+
+from src.log import log
+from src.utils import Util
+
+RECORD_END = b"\n...\n"
+
+
+class ChangeLog:
+    """Append-only log of config mutations.
+    Records are replayed on top of config.yaml on start and dropped after config.yaml is saved"""
+
+    def __init__(self):
+        self.path = None
+        self.enabled = False
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+
+    def open(self, path, enabled=True):
+        """Bind change log to file. If change log is disabled, existing file is still replayed and compacted"""
+        self.path = path
+        self.enabled = enabled
+
+    def set(self, path, value):
+        """Record assignment of value to config field (path is a sequence of attribute names and dict keys)"""
+        self._append({"op": "set", "path": list(path), "value": value})
+
+    def delete(self, path):
+        """Record removal of config field or dict item"""
+        self._append({"op": "del", "path": list(path)})
+
+    def _append(self, record):
+        if not self.enabled:
+            return
+        _, yaml_dumper = Util.get_yaml()
+        record = yaml.dump(
+            record, Dumper=yaml_dumper, encoding='utf-8', allow_unicode=True, explicit_start=True, explicit_end=True)
+        with self._pending_lock:
+            self._pending.append(record)
+
+    def flush(self):
+        """Write pending records to disk (single fsync per batch)"""
+        with self._file_lock:
+            with self._pending_lock:
+                records, self._pending = self._pending, []
+            if not records or self.path is None:
+                return
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(records))
+                f.flush()
+                os.fsync(f.fileno())
+            log.debug2(f"Flushed {len(records)} record(s) to {self.path}")
+
+    def compact(self):
+        """Drop all records. Should be called when config.yaml with all changes is saved"""
+        with self._file_lock:
+            with self._pending_lock:
+                self._pending = []
+            if self.path is not None and os.path.exists(self.path):
+                open(self.path, 'wb').close()
+
+    def replay(self, config):
+        """Apply records from change log file to config"""
+        path = self.path
+        if path is None or not os.path.isfile(path):
+            return 0
+        yaml_loader, _ = Util.get_yaml()
+        with open(path, 'rb') as f:
+            chunks = f.read().split(RECORD_END)
+        count = 0
+        for chunk in chunks[:-1]:
+            try:
+                record = yaml.load(chunk, Loader=yaml_loader)
+                self._apply(config, record)
+                count += 1
+            except Exception:
+                log.error(f"Failed to replay record from {path}: {chunk}", exc_info=True)
+        if chunks[-1].strip():
+            log.warning(f"Incomplete record at the end of {path} is dropped")
+        return count
+
+    @staticmethod
+    def _apply(config, record):
+        obj = config
+        for key in record["path"][:-1]:
+            obj = obj[key] if isinstance(obj, dict) else getattr(obj, key)
+        key = record["path"][-1]
+        if record["op"] == "set":
+            if isinstance(obj, dict):
+                obj[key] = record["value"]
+            else:
+                setattr(obj, key, record["value"])
+        elif record["op"] == "del":
+            if isinstance(obj, dict):
+                obj.pop(key, None)
+            elif hasattr(obj, key):
+                delattr(obj, key)
+        else:
+            raise ValueError(f"Unknown change log operation: {record['op']}")
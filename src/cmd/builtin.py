@@ -1,56 +1,63 @@
 import asyncio
-import base64
 import datetime
 import imghdr
+import io
 import os
 import random
 import re
-import shutil
-import tempfile
 import urllib.request
 
 import discord
-import requests
 
 from src import const, emoji
 from src.commands import BaseCmd
 from src.config import BackgroundEvent, Command, bc, log
+from src.http_client import HttpError
 from src.message import Msg
 from src.utils import Util
 
 
 class _BuiltinInternals:
+    @staticmethod
+    async def send_image(message, info, silent, original=False):
+        if silent:
+            log.info(f"[SILENT] -> image {info.name}")
+            return
+        path = info.path
+        if not original:
+            path = await bc.image_store.get_upload_path(info.path, bc.config.image_variants)
+        await Msg.response(
+            message, None, silent, files=[discord.File(path, filename=info.name + os.path.splitext(path)[1])])
+
     @staticmethod
     async def get_image(message, command, silent):
-        for i in range(1, len(command)):
-            for root, _, files in os.walk("images"):
-                if root.endswith("images"):
-                    for file in files:
-                        if not silent and os.path.splitext(os.path.basename(file))[0].lower() == command[i].lower():
-                            await Msg.response(message, None, silent,
-                                               files=[discord.File(os.path.join("images", file))])
-                            break
-                    else:
-                        # Custom emoji
-                        r = const.EMOJI_REGEX.match(command[i])
-                        if r is not None:
-                            await Msg.response(message, f"https://cdn.discordapp.com/emojis/{r.group(2)}.png", silent)
-                            break
-                        # Unicode emoji
-                        emojis_page = requests.get('https://unicode.org/emoji/charts/full-emoji-list.html').text
-                        emoji_match = r"<img alt='{}' class='imga' src='data:image/png;base64,([^']+)'>"
-                        emoji_match = re.findall(emoji_match.format(command[i]), emojis_page)
-                        if emoji_match:
-                            temp_image_file = tempfile.NamedTemporaryFile()
-                            with open(temp_image_file.name, 'wb') as f:
-                                f.write(base64.b64decode(emoji_match[4]))  # Twemoji is located under the 4th number
-                            shutil.copy(temp_image_file.name, temp_image_file.name + ".png")
-                            await Msg.response(
-                                message, None, silent, files=[discord.File(temp_image_file.name + ".png")])
-                            os.unlink(temp_image_file.name + ".png")
-                            break
-                        await Msg.response(message, f"Image {command[i]} is not found!", silent)
-                    break
+        original = len(command) > 1 and command[1] == "--original"
+        for i in range(2 if original else 1, len(command)):
+            info = bc.images.get(command[i])
+            if info is not None:
+                await _BuiltinInternals.send_image(message, info, silent, original)
+                continue
+            # Custom emoji
+            r = const.EMOJI_REGEX.match(command[i])
+            if r is not None:
+                await Msg.response(message, f"https://cdn.discordapp.com/emojis/{r.group(2)}.png", silent)
+                continue
+            # Unicode emoji
+            image = bc.emoji_index.get(command[i])
+            if image is not None:
+                if silent:
+                    log.info(f"[SILENT] -> emoji image {command[i]}")
+                else:
+                    await Msg.response(message, None, silent, files=[discord.File(io.BytesIO(image), "emoji.png")])
+                continue
+            if not bc.emoji_index.is_available() and any(ord(c) > 127 for c in command[i]):
+                log.warning(f"Emoji index {const.EMOJI_INDEX_PATH} is not found. "
+                            "Build it using: python walbot.py emojis")
+                await Msg.response(
+                    message, f"Image {command[i]} is not found! Unicode emojis are not available, "
+                    "because emoji index is not built (bot owner can build it using: python walbot.py emojis)", silent)
+                continue
+            await Msg.response(message, f"Image {command[i]} is not found!", silent)
 
 
 class BuiltinCommands(BaseCmd):
@@ -175,6 +182,10 @@ class BuiltinCommands(BaseCmd):
                                      permission=const.Permission.MOD.value, subcommand=False)
         bc.commands.register_command(__name__, self.get_classname(), "curl",
                                      permission=const.Permission.USER.value, subcommand=True)
+        bc.commands.register_command(__name__, self.get_classname(), "stats",
+                                     permission=const.Permission.USER.value, subcommand=False)
+        bc.commands.register_command(__name__, self.get_classname(), "extcache",
+                                     permission=const.Permission.ADMIN.value, subcommand=False)
         bc.commands.register_command(__name__, self.get_classname(), "echo",
                                      message="@args@",
                                      permission=const.Permission.USER.value, subcommand=True)
@@ -351,8 +362,10 @@ class BuiltinCommands(BaseCmd):
             if not message.mentions:
                 await Msg.response(message, "You need to mention the user you want to get profile of", silent)
                 return
-            info = message.guild.get_member(message.mentions[0].id)
-        if info is None:
+            # Member is taken from message, because member cache is not populated without members intent.
+            # Mentioned user who is not a member of the guild is discord.User
+            info = message.mentions[0]
+        if not isinstance(info, discord.Member):
             await Msg.response(message, "Could not get information about this user", silent)
             return
         roles = ', '.join([x if x != const.ROLE_EVERYONE else const.ROLE_EVERYONE[1:] for x in map(str, info.roles)])
@@ -441,6 +454,7 @@ class BuiltinCommands(BaseCmd):
             return
         bc.commands.data[command_name] = Command(command_name, message=' '.join(command[2:]))
         bc.commands.data[command_name].channels.append(message.channel.id)
+        bc.changelog.set(("commands", "data", command_name), bc.commands.data[command_name])
         await Msg.response(
             message, f"Command '{command_name}' -> '{bc.commands.data[command_name].message}' successfully added",
             silent)
@@ -458,6 +472,7 @@ class BuiltinCommands(BaseCmd):
             return
         bc.commands.data[command_name] = Command(command_name, cmd_line=' '.join(command[2:]))
         bc.commands.data[command_name].channels.append(message.channel.id)
+        bc.changelog.set(("commands", "data", command_name), bc.commands.data[command_name])
         await Msg.response(
             message, f"Command '{command_name}' that calls external command "
                      f"`{bc.commands.data[command_name].cmd_line}` is successfully added", silent)
@@ -474,6 +489,7 @@ class BuiltinCommands(BaseCmd):
                 await Msg.response(message, f"Command '{command_name}' is not editable", silent)
                 return
             bc.commands.data[command_name].message = ' '.join(command[2:])
+            bc.changelog.set(("commands", "data", command_name, "message"), bc.commands.data[command_name].message)
             await Msg.response(
                 message, f"Command '{command_name}' -> "
                          f"'{bc.commands.data[command_name].message}' successfully updated", silent)
@@ -493,6 +509,7 @@ class BuiltinCommands(BaseCmd):
                 await Msg.response(message, f"Command '{command_name}' is not editable", silent)
                 return
             bc.commands.data[command_name].cmd_line = ' '.join(command[2:])
+            bc.changelog.set(("commands", "data", command_name, "cmd_line"), bc.commands.data[command_name].cmd_line)
             await Msg.response(
                 message, f"Command '{command_name}' that calls external command "
                          f"`{bc.commands.data[command_name].cmd_line}` is successfully updated", silent)
@@ -508,6 +525,7 @@ class BuiltinCommands(BaseCmd):
         command_name = command[1]
         if command_name in bc.commands.data.keys():
             bc.commands.data.pop(command_name, None)
+            bc.changelog.delete(("commands", "data", command_name))
             await Msg.response(message, f"Command '{command_name}' successfully deleted", silent)
             return
         await Msg.response(message, f"Command '{command_name}' does not exist", silent)
@@ -538,6 +556,9 @@ class BuiltinCommands(BaseCmd):
                 await Msg.response(message, f"Command '{command_name}' is enabled in global scope", silent)
             else:
                 await Msg.response(message, f"Unknown scope '{command[2]}'", silent)
+                return
+            bc.changelog.set(("commands", "data", command_name, "channels"), bc.commands.data[command_name].channels)
+            bc.changelog.set(("commands", "data", command_name, "is_global"), bc.commands.data[command_name].is_global)
             return
         await Msg.response(message, f"Command '{command_name}' does not exist", silent)
 
@@ -567,6 +588,9 @@ class BuiltinCommands(BaseCmd):
                 await Msg.response(message, f"Command '{command_name}' is disabled in global scope", silent)
             else:
                 await Msg.response(message, f"Unknown scope '{command[2]}'", silent)
+                return
+            bc.changelog.set(("commands", "data", command_name, "channels"), bc.commands.data[command_name].channels)
+            bc.changelog.set(("commands", "data", command_name, "is_global"), bc.commands.data[command_name].is_global)
             return
         await Msg.response(message, f"Command '{command_name}' does not exist", silent)
 
@@ -583,6 +607,7 @@ class BuiltinCommands(BaseCmd):
             return
         if command_name in bc.commands.data.keys():
             bc.commands.data[command_name].permission = perm
+            bc.changelog.set(("commands", "data", command_name, "permission"), perm)
             await Msg.response(message, f"Set permission level {command[2]} for command '{command_name}'", silent)
             return
         await Msg.response(message, f"Command '{command_name}' does not exist", silent)
@@ -625,12 +650,15 @@ class BuiltinCommands(BaseCmd):
                 message, f"Second argument of command '{command[0]}' should be user ping", silent)
             return
         user_id = int(r.group(1))
-        for user in bc.config.users.keys():
-            if bc.config.users[user].id == user_id:
-                bc.config.users[user].permission_level = perm
-                await Msg.response(message, f"User permissions are set to {command[2]}", silent)
-                return
-        await Msg.response(message, f"User '{command[1]}' is not found", silent)
+        user = bc.config.get_user(user_id)
+        user.permission_level = perm
+        if perm == const.Permission.USER.value:
+            bc.config.users.pop(user_id, None)
+            bc.changelog.delete(("users", user_id))
+        else:
+            bc.config.users[user_id] = user
+            bc.changelog.set(("users", user_id), user)
+        await Msg.response(message, f"User permissions are set to {command[2]}", silent)
 
     @staticmethod
     async def _extexec(message, command, silent=False):
@@ -639,7 +667,7 @@ class BuiltinCommands(BaseCmd):
     Example: !extexec uname -a"""
         if not await Util.check_args_count(message, command, silent, min=2):
             return
-        return await Util.run_external_command(message, ' '.join(command[1:]), silent)
+        return await bc.external_commands.run(message, ' '.join(command[1:]), silent, bc.config.external_commands)
 
     @staticmethod
     async def _whitelist(message, command, silent=False):
@@ -664,6 +692,8 @@ class BuiltinCommands(BaseCmd):
             await Msg.response(message, "This channel is removed from bot's whitelist", silent)
         else:
             await Msg.response(message, f"Unknown argument '{command[1]}'", silent)
+            return
+        bc.changelog.set(("guilds", message.channel.guild.id), bc.config.guilds[message.channel.guild.id])
 
     @staticmethod
     async def _config(message, command, silent=False):
@@ -797,6 +827,8 @@ class BuiltinCommands(BaseCmd):
                     await Msg.response(message, "The third argument should be either 'enable' or 'disable'", silent)
             else:
                 await Msg.response(message, f"Incorrect argument for command '{command[0]}'", silent)
+                return
+            bc.changelog.set(("guilds", message.channel.guild.id), bc.config.guilds[message.channel.guild.id])
         else:
             await Msg.response(message, f"Incorrect usage of command '{command[0]}'", silent)
 
@@ -1088,6 +1120,7 @@ class BuiltinCommands(BaseCmd):
             await Msg.response(message, f"Alias '{command[2]}' already exists", silent)
             return
         bc.commands.aliases[command[2]] = command[1]
+        bc.changelog.set(("commands", "aliases", command[2]), command[1])
         await Msg.response(message, f"Alias '{command[2]}' for '{command[1]}' was successfully created", silent)
 
     @staticmethod
@@ -1101,6 +1134,7 @@ class BuiltinCommands(BaseCmd):
             await Msg.response(message, f"Alias '{command[1]}' does not exist", silent)
             return
         bc.commands.aliases.pop(command[1])
+        bc.changelog.delete(("commands", "aliases", command[1]))
         await Msg.response(message, f"Alias '{command[1]}' was successfully deleted", silent)
 
     @staticmethod
@@ -1118,22 +1152,25 @@ class BuiltinCommands(BaseCmd):
     @staticmethod
     async def _img(message, command, silent=False):
         """Send image (use !listimg for list of available images)
-    Example: !img <image_name>"""
+    Examples:
+        !img - send random image
+        !img <image_name> - send image (large images are sent downscaled and recompressed)
+        !img --original <image_name> - send original image"""
         if len(command) == 1:
-            list_images = os.listdir("images")
-            if len(list_images) == 0:
+            info = bc.images.random()
+            if info is None:
                 await Msg.response(message, "No images found!", silent)
                 return
-            result = random.randint(0, len(list_images)-1)  # integer random
-            await Msg.response(message, None, silent,
-                               files=[discord.File(os.path.join("images", list_images[result]))])
+            await _BuiltinInternals.send_image(message, info, silent)
             return
         await _BuiltinInternals.get_image(message, command, silent)
 
     @staticmethod
     async def _wmeimg(message, command, silent=False):
         """Send image in direct message to author
-    Example: !wmeimg <image_name>"""
+    Examples:
+        !wmeimg <image_name>
+        !wmeimg --original <image_name>"""
         if not await Util.check_args_count(message, command, silent, min=2):
             return
         await _BuiltinInternals.get_image(message, command, silent)
@@ -1141,19 +1178,29 @@ class BuiltinCommands(BaseCmd):
     @staticmethod
     async def _listimg(message, command, silent=False):
         """Print list of available images for !img command
-    Example: !listimg"""
-        if not await Util.check_args_count(message, command, silent, min=1, max=1):
+    Examples:
+        !listimg - first page of the list
+        !listimg 2 - second page of the list"""
+        if not await Util.check_args_count(message, command, silent, min=1, max=2):
             return
-        result = []
-        for root, _, files in os.walk("images"):
-            if root.endswith("images"):
-                for file in files:
-                    result.append(os.path.splitext(os.path.basename(file))[0])
-        result.sort()
-        if result:
-            await Msg.response(message, "List of available images: [" + ', '.join(result) + "]", silent)
-        else:
+        names = bc.images.names()
+        if not names:
             await Msg.response(message, "No available images found!", silent)
+            return
+        page = 1
+        if len(command) == 2:
+            page = await Util.parse_int(message, command[1], "Page number should be an integer", silent)
+            if page is None:
+                return
+        pages = (len(names) - 1) // const.IMAGES_LIST_PAGE_SIZE + 1
+        if not 1 <= page <= pages:
+            await Msg.response(message, f"Page number should be in range from 1 to {pages}", silent)
+            return
+        names = names[(page - 1) * const.IMAGES_LIST_PAGE_SIZE:page * const.IMAGES_LIST_PAGE_SIZE]
+        header = "List of available images" + (f" (page {page}/{pages})" if pages > 1 else "")
+        result = header + ": [" + ', '.join(names) + "]"
+        await Msg.response(message, result, silent)
+        return result
 
     @staticmethod
     async def _addimg(message, command, silent=False):
@@ -1170,37 +1217,29 @@ class BuiltinCommands(BaseCmd):
         if ext not in ["jpg", "jpeg", "png", "ico", "gif", "bmp"]:
             await Msg.response(message, "Please, provide direct link to image", silent)
             return
-        for root, _, files in os.walk("images"):
-            if root.endswith("images"):
-                for file in files:
-                    if name == os.path.splitext(os.path.basename(file))[0]:
-                        await Msg.response(message, f"Image '{name}' already exists", silent)
-                        return
-        if not os.path.exists("images"):
-            os.makedirs("images")
-        image_path = os.path.join("images", name + '.' + ext)
-        with open(image_path, 'wb') as f:
-            try:
-                hdr = {
-                    "User-Agent": "Mozilla/5.0"
-                }
-                rq = urllib.request.Request(url, headers=hdr)
-                with urllib.request.urlopen(rq) as response:
-                    f.write(response.read())
-            except ValueError:
-                await Msg.response(message, "Incorrect image URL format!", silent)
-                return
-            except Exception as e:
-                await Msg.response(message, f"Image downloading failed: {e}", silent)
-                os.remove(image_path)
-                log.error("Image downloading failed!", exc_info=True)
-                return
+        if bc.images.get(name) is not None:
+            await Msg.response(message, f"Image '{name}' already exists", silent)
+            return
+        if not os.path.exists(const.IMAGES_DIRECTORY):
+            os.makedirs(const.IMAGES_DIRECTORY)
+        image_path = os.path.join(const.IMAGES_DIRECTORY, name + '.' + ext)
+        try:
+            await bc.http.download(url, image_path, bc.config.http_client)
+        except HttpError as e:
+            await Msg.response(message, f"Image downloading failed: {e}", silent)
+            log.error(f"Image downloading failed: {e}")
+            return
         if imghdr.what(image_path) is None:
             await Msg.response(message, "Received file is not an image", silent)
             log.error("Received file is not an image!")
             os.remove(image_path)
             log.info(f"Removed file {image_path}")
             return
+        duplicate = await bc.background_loop.run_in_executor(
+            None, bc.image_store.add, image_path, bc.config.image_variants)
+        if duplicate:
+            log.info(f"Image '{name}' is identical to already stored image, stored copy is reused")
+        bc.images.add(name, image_path)
         await Msg.response(message, f"Image '{name}' successfully added!", silent)
 
     @staticmethod
@@ -1213,13 +1252,13 @@ class BuiltinCommands(BaseCmd):
         if not re.match(const.FILENAME_REGEX, name):
             await Msg.response(message, f"Incorrect name '{name}'", silent)
             return
-        for root, _, files in os.walk("images"):
-            if root.endswith("images"):
-                for file in files:
-                    if name == os.path.splitext(os.path.basename(file))[0]:
-                        os.remove(os.path.join("images", file))
-                        await Msg.response(message, f"Successfully removed image '{name}'", silent)
-                        return
+        info = bc.images.get(name)
+        if info is not None:
+            digest = await asyncio.get_event_loop().run_in_executor(None, bc.image_store.digest, info.path)
+            bc.images.remove(name)
+            bc.image_store.collect(digest)
+            await Msg.response(message, f"Successfully removed image '{name}'", silent)
+            return
         await Msg.response(message, f"Image '{name}' not found!", silent)
 
     @staticmethod
@@ -1312,42 +1351,33 @@ class BuiltinCommands(BaseCmd):
     Hint: Use !listimg for list of available images"""
         if not await Util.check_args_count(message, command, silent, min=2, max=2):
             return
-        for root, _, files in os.walk("images"):
-            if root.endswith("images"):
-                for file in files:
-                    if os.path.splitext(os.path.basename(file))[0] == command[1]:
-                        try:
-                            with open(os.path.join("images", file), "rb") as f:
-                                await bc.bot_user.edit(avatar=f.read())
-                            await Msg.response(
-                                message, f"Successfully changed bot avatar to {command[1]}", silent)
-                        except discord.HTTPException as e:
-                            await Msg.response(
-                                message, f"Failed to change bot avatar.\nError: {e}", silent)
-                        return
-                else:
-                    r = const.EMOJI_REGEX.match(command[1])
-                    if r is None:
-                        break
-                    log.debug(f"Downloading https://cdn.discordapp.com/emojis/{r.group(2)}.png")
-                    hdr = {
-                        "User-Agent": "Mozilla/5.0"
-                    }
-                    rq = urllib.request.Request(
-                        f"https://cdn.discordapp.com/emojis/{r.group(2)}.png", headers=hdr)
-                    temp_image_file = tempfile.NamedTemporaryFile()
-                    try:
-                        with urllib.request.urlopen(rq) as response:
-                            temp_image_file.write(response.read())
-                        with open(temp_image_file.name, "rb") as temp_image_file:
-                            await bc.bot_user.edit(avatar=temp_image_file.read())
-                    except Exception as e:
-                        await Msg.response(message, f"Image downloading failed: {e}", silent)
-                        log.error("Image downloading failed!", exc_info=True)
-                        return
-                    await Msg.response(message, f"Successfully changed bot avatar to {command[1]}", silent)
-                    return
-        await Msg.response(message, f"Image {command[1]} is not found!", silent)
+        info = bc.images.get(command[1])
+        if info is not None:
+            try:
+                with open(info.path, "rb") as f:
+                    await bc.bot_user.edit(avatar=f.read())
+                await Msg.response(message, f"Successfully changed bot avatar to {command[1]}", silent)
+            except discord.HTTPException as e:
+                await Msg.response(message, f"Failed to change bot avatar.\nError: {e}", silent)
+            return
+        r = const.EMOJI_REGEX.match(command[1])
+        if r is None:
+            await Msg.response(message, f"Image {command[1]} is not found!", silent)
+            return
+        log.debug(f"Downloading https://cdn.discordapp.com/emojis/{r.group(2)}.png")
+        try:
+            response = await bc.http.get(f"https://cdn.discordapp.com/emojis/{r.group(2)}.png", bc.config.http_client)
+            try:
+                with open(response.path, "rb") as f:
+                    avatar = f.read()
+            finally:
+                response.release()
+            await bc.bot_user.edit(avatar=avatar)
+        except (HttpError, discord.HTTPException) as e:
+            await Msg.response(message, f"Image downloading failed: {e}", silent)
+            log.error(f"Image downloading failed: {e}")
+            return
+        await Msg.response(message, f"Successfully changed bot avatar to {command[1]}", silent)
 
     @staticmethod
     async def _message(message, command, silent=False):
@@ -1368,12 +1398,13 @@ class BuiltinCommands(BaseCmd):
                 silent)
             return
         result = bc.message_buffer.get(message.channel.id, number)
-        if result is not None:
-            result = result.content
-        else:
-            result = await message.channel.history(limit=number+1).flatten()
-            bc.message_buffer.data[message.channel.id] = result
-            result = result[-1].content
+        if result is None:
+            await bc.message_buffer.backfill(message.channel, number + 1)
+            result = bc.message_buffer.get(message.channel.id, number)
+        if result is None:
+            await Msg.response(message, "There are not so many messages in this channel", silent)
+            return
+        result = result.content
         await Msg.response(message, result, silent)
         return result
 
@@ -1432,7 +1463,70 @@ class BuiltinCommands(BaseCmd):
         if not await Util.check_args_count(message, command, silent, min=2, max=2):
             return
         url = command[1]
-        r = requests.get(url)
-        result = r.text
+        try:
+            result = await bc.http.get_text(url, bc.config.http_client)
+        except HttpError as e:
+            await Msg.response(message, f"Failed to fetch {url}: {e}", silent)
+            return
         await Msg.response(message, result, silent)
         return result
+
+    @staticmethod
+    async def _stats(message, command, silent=False):
+        """Show execution statistics of commands (latency, errors, response size)
+    Examples:
+        !stats - show commands with highest total execution time
+        !stats echo ping - show statistics for specified commands
+        !stats reset - reset statistics (admin only)"""
+        if len(command) == 2 and command[1] == "reset":
+            if bc.config.get_user(message.author.id).permission_level < const.Permission.ADMIN.value:
+                await Msg.response(message, "You don't have permission to reset statistics", silent)
+                return
+            bc.stats.reset()
+            bc.rate_limiter.reset_counters()
+            bc.external_commands.reset_counters()
+            bc.http.reset_counters()
+            await Msg.response(message, "Statistics is reset", silent)
+            return
+        names = [bc.config.commands.aliases.get(name, name) for name in command[1:]] or None
+        result = ((bc.stats.report(names) or "No commands were executed yet\n") +
+                  bc.rate_limiter.report() + '\n' + bc.external_commands.report() + '\n' + bc.http.report())
+        await Msg.response(message, result, silent)
+        return result
+
+    @staticmethod
+    async def _extcache(message, command, silent=False):
+        """Manage cache of external command results
+    Examples:
+        !extcache - show cached results and cache statistics
+        !extcache ttl weather 60 - cache results of command 'weather' for 60 seconds (0 disables caching)
+        !extcache flush - drop all cached results"""
+        if len(command) == 1:
+            result = bc.external_commands.cache_report()
+            await Msg.response(message, result, silent)
+            return result
+        if command[1] == "flush" and len(command) == 2:
+            count = bc.external_commands.flush_cache()
+            await Msg.response(message, f"Dropped {count} cached result(s)", silent)
+            return
+        if command[1] == "ttl" and len(command) == 4:
+            command_name = bc.config.commands.aliases.get(command[2], command[2])
+            if command_name not in bc.commands.data.keys():
+                await Msg.response(message, f"Command '{command_name}' does not exist", silent)
+                return
+            if bc.commands.data[command_name].cmd_line is None:
+                await Msg.response(message, f"Command '{command_name}' does not call external command", silent)
+                return
+            ttl = await Util.parse_int(
+                message, command[3], f"Third parameter for '{command[0]}' should be time to live in seconds", silent)
+            if ttl is None:
+                return
+            if ttl < 0:
+                await Msg.response(message, "Time to live should not be negative", silent)
+                return
+            bc.commands.data[command_name].cache_ttl = ttl
+            bc.changelog.set(("commands", "data", command_name, "cache_ttl"), ttl)
+            await Msg.response(message, f"Results of command '{command_name}' are cached for {ttl} seconds"
+                               if ttl else f"Results of command '{command_name}' are not cached", silent)
+            return
+        await Msg.response(message, f"Usage: !{command[0]} [ttl <command> <seconds> | flush]", silent)
@@ -6,6 +6,7 @@ from src import const
 from src.commands import BaseCmd
 from src.config import bc
 from src.message import Msg
+from src.regex_safety import RegexTimeout, check_regex
 from src.utils import Util
 
 
@@ -70,10 +71,14 @@ class MarkovCommands(BaseCmd):
         if not await Util.check_args_count(message, command, silent, min=2):
             return
         regex = ' '.join(command[1:])
+        error = check_regex(regex)
+        if error is not None:
+            await Msg.response(message, error, silent)
+            return
         try:
-            removed = bc.markov.del_words(regex)
-        except re.error as e:
-            await Msg.response(message, f"Invalid regular expression: {e}", silent)
+            removed = await bc.markov.del_words(regex, bc.config.regex_safety["search_timeout"])
+        except RegexTimeout as e:
+            await Msg.response(message, f"Search is aborted: {e}", silent)
             return
         await Msg.response(
             message, f"Deleted {len(removed)} words from model: {removed}", silent, suppress_embeds=True)
@@ -87,14 +92,18 @@ class MarkovCommands(BaseCmd):
         if not await Util.check_args_count(message, command, silent, min=2):
             return
         regex = command[1]
+        error = check_regex(regex)
+        if error is not None:
+            await Msg.response(message, error, silent)
+            return
         try:
-            found = bc.markov.find_words(regex)
-        except re.error as e:
-            await Msg.response(message, f"Invalid regular expression: {e}", silent)
+            found = await bc.markov.find_words(regex, bc.config.regex_safety["search_timeout"])
+        except RegexTimeout as e:
+            await Msg.response(message, f"Search is aborted: {e}", silent)
             return
         amount = len(found)
         if not (len(command) > 2 and command[2] == '-f' and
-                bc.config.users[message.author.id].permission_level >= const.Permission.MOD.value):
+                bc.config.get_user(message.author.id).permission_level >= const.Permission.MOD.value):
             found = found[:100]
         await Msg.response(
             message, f"Found {amount} words in model: {found}"
@@ -152,6 +161,10 @@ class MarkovCommands(BaseCmd):
     Example: !addmarkovfilter regex"""
         if not await Util.check_args_count(message, command, silent, min=2, max=2):
             return
+        error = check_regex(command[1])
+        if error is not None:
+            await Msg.response(message, error, silent)
+            return
         bc.markov.filters.append(re.compile(command[1]))
         await Msg.response(message, f"Filter '{command[1]}' was successfully added for Markov model", silent)
 
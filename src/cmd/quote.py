@@ -54,6 +54,8 @@ class QuoteCommands(BaseCmd):
         index = bc.config.ids["quote"]
         bc.config.quotes[index] = Quote(quote, str(message.author))
         bc.config.ids["quote"] += 1
+        bc.changelog.set(("quotes", index), bc.config.quotes[index])
+        bc.changelog.set(("ids", "quote"), bc.config.ids["quote"])
         await Msg.response(
             message,
             f"Quote '{quote}' was successfully added to quotes database with index {index}",
@@ -86,6 +88,7 @@ class QuoteCommands(BaseCmd):
             return
         if index in bc.config.quotes.keys():
             bc.config.quotes.pop(index)
+            bc.changelog.delete(("quotes", index))
             await Msg.response(message, "Successfully deleted quote!", silent)
         else:
             await Msg.response(message, "Invalid index of quote!", silent)
@@ -103,6 +106,7 @@ class QuoteCommands(BaseCmd):
         if index in bc.config.quotes.keys():
             author = ' '.join(command[2:])
             bc.config.quotes[index].author = author
+            bc.changelog.set(("quotes", index, "author"), author)
             await Msg.response(
                 message, f"Successfully set author '{author}' for quote '{bc.config.quotes[index].quote()}'", silent)
         else:
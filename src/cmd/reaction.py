@@ -2,6 +2,7 @@ from src import const
 from src.commands import BaseCmd
 from src.config import Reaction, Response, bc
 from src.message import Msg
+from src.regex_safety import check_regex
 from src.utils import Util
 
 
@@ -30,8 +31,16 @@ class ReactionCommands(BaseCmd):
     Example: !addreaction emoji regex"""
         if not await Util.check_args_count(message, command, silent, min=3):
             return
-        bc.config.reactions[bc.config.ids["reaction"]] = Reaction(' '.join(command[2:]), command[1])
+        error = check_regex(' '.join(command[2:]))
+        if error is not None:
+            await Msg.response(message, error, silent)
+            return
+        index = bc.config.ids["reaction"]
+        bc.config.reactions[index] = Reaction(' '.join(command[2:]), command[1])
         bc.config.ids["reaction"] += 1
+        bc.changelog.set(("reactions", index), bc.config.reactions[index])
+        bc.reactions_matcher.invalidate()
+        bc.changelog.set(("ids", "reaction"), bc.config.ids["reaction"])
         await Msg.response(message, f"Reaction '{command[1]}' on '{' '.join(command[2:])}' successfully added", silent)
 
     @staticmethod
@@ -45,7 +54,13 @@ class ReactionCommands(BaseCmd):
         if index is None:
             return
         if index in bc.config.reactions.keys():
+            error = check_regex(' '.join(command[3:]))
+            if error is not None:
+                await Msg.response(message, error, silent)
+                return
             bc.config.reactions[index] = Reaction(' '.join(command[3:]), command[2])
+            bc.changelog.set(("reactions", index), bc.config.reactions[index])
+            bc.reactions_matcher.invalidate()
             await Msg.response(
                 message, f"Reaction '{command[1]}' on '{' '.join(command[2:])}' successfully updated", silent)
         else:
@@ -64,6 +79,8 @@ class ReactionCommands(BaseCmd):
             return
         if index in bc.config.reactions.keys():
             bc.config.reactions.pop(index)
+            bc.changelog.delete(("reactions", index))
+            bc.reactions_matcher.invalidate()
             await Msg.response(message, "Successfully deleted reaction!", silent)
         else:
             await Msg.response(message, "Invalid index of reaction!", silent)
@@ -76,7 +93,7 @@ class ReactionCommands(BaseCmd):
             return
         result = ""
         for index, reaction in bc.config.reactions.items():
-            result += f"{index} - {reaction.emoji}: `{reaction.regex}`\n"
+            result += f"{index} - {reaction.emoji}: `{reaction.regex}`{' (disabled)' if reaction.disabled else ''}\n"
         if result:
             await Msg.response(message, result, silent)
         else:
@@ -95,8 +112,16 @@ class ReactionCommands(BaseCmd):
                 message, "You need to provide regex and text that are separated by semicolon (;)", silent)
             return
         regex, text = parts
-        bc.config.responses[bc.config.ids["response"]] = Response(regex, text)
+        error = check_regex(regex)
+        if error is not None:
+            await Msg.response(message, error, silent)
+            return
+        index = bc.config.ids["response"]
+        bc.config.responses[index] = Response(regex, text)
         bc.config.ids["response"] += 1
+        bc.changelog.set(("responses", index), bc.config.responses[index])
+        bc.responses_matcher.invalidate()
+        bc.changelog.set(("ids", "response"), bc.config.ids["response"])
         await Msg.response(message, f"Response '{text}' on '{regex}' successfully added", silent)
 
     @staticmethod
@@ -116,7 +141,13 @@ class ReactionCommands(BaseCmd):
                     message, "You need to provide regex and text that are separated by semicolon (;)", silent)
                 return
             regex, text = parts
+            error = check_regex(regex)
+            if error is not None:
+                await Msg.response(message, error, silent)
+                return
             bc.config.responses[index] = Response(regex, text)
+            bc.changelog.set(("responses", index), bc.config.responses[index])
+            bc.responses_matcher.invalidate()
             await Msg.response(message, f"Response '{text}' on '{regex}' successfully updated", silent)
         else:
             await Msg.response(message, "Incorrect index of response!", silent)
@@ -134,6 +165,8 @@ class ReactionCommands(BaseCmd):
             return
         if index in bc.config.responses.keys():
             bc.config.responses.pop(index)
+            bc.changelog.delete(("responses", index))
+            bc.responses_matcher.invalidate()
             await Msg.response(message, "Successfully deleted response!", silent)
         else:
             await Msg.response(message, "Invalid index of response!", silent)
@@ -146,7 +179,7 @@ class ReactionCommands(BaseCmd):
             return
         result = ""
         for index, response in bc.config.responses.items():
-            result += f"{index} - `{response.regex}`: {response.text}\n"
+            result += f"{index} - `{response.regex}`{' (disabled)' if response.disabled else ''}: {response.text}\n"
         if result:
             await Msg.response(message, result, silent)
         else:
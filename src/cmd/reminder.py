@@ -62,6 +62,9 @@ class ReminderCommands(BaseCmd):
             id_ = bc.config.ids["reminder"]
             bc.config.reminders[id_] = Reminder(str(time), text, message.channel.id)
             bc.config.ids["reminder"] += 1
+            bc.changelog.set(("reminders", id_), bc.config.reminders[id_])
+            bc.changelog.set(("ids", "reminder"), bc.config.ids["reminder"])
+            bc.reminder_scheduler.schedule(id_, bc.config.reminders[id_])
             await Msg.response(message, f"Reminder '{text}' with id {id_} added at {time}", silent)
             return
 
@@ -100,6 +103,9 @@ class ReminderCommands(BaseCmd):
         id_ = bc.config.ids["reminder"]
         bc.config.reminders[id_] = Reminder(str(time), text, message.channel.id)
         bc.config.ids["reminder"] += 1
+        bc.changelog.set(("reminders", id_), bc.config.reminders[id_])
+        bc.changelog.set(("ids", "reminder"), bc.config.ids["reminder"])
+        bc.reminder_scheduler.schedule(id_, bc.config.reminders[id_])
         await Msg.response(message, f"Reminder '{text}' with id {id_} added at {time}", silent)
 
     @staticmethod
@@ -122,6 +128,8 @@ class ReminderCommands(BaseCmd):
                 return
             text = ' '.join(command[4:])
             bc.config.reminders[index] = Reminder(str(time), text, message.channel.id)
+            bc.changelog.set(("reminders", index), bc.config.reminders[index])
+            bc.reminder_scheduler.schedule(index, bc.config.reminders[index])
             await Msg.response(
                 message, f"Successfully updated reminder {index}: '{text}' at {time}", silent)
         else:
@@ -161,6 +169,8 @@ class ReminderCommands(BaseCmd):
             return
         if index in bc.config.reminders.keys():
             bc.config.reminders.pop(index)
+            bc.changelog.delete(("reminders", index))
+            bc.reminder_scheduler.cancel(index)
             await Msg.response(message, "Successfully deleted reminder!", silent)
         else:
             await Msg.response(message, "Invalid index of reminder!", silent)
@@ -177,6 +187,7 @@ class ReminderCommands(BaseCmd):
             return
         if index in bc.config.reminders.keys():
             bc.config.reminders[index].ping_users.append(message.author.mention)
+            bc.changelog.set(("reminders", index, "ping_users"), bc.config.reminders[index].ping_users)
             await Msg.response(message, f"You will be mentioned when reminder {index} is sent", silent)
         else:
             await Msg.response(message, "Invalid index of reminder!", silent)
@@ -193,6 +204,7 @@ class ReminderCommands(BaseCmd):
             return
         if index in bc.config.reminders.keys():
             bc.config.reminders[index].whisper_users.append(message.author.id)
+            bc.changelog.set(("reminders", index, "whisper_users"), bc.config.reminders[index].whisper_users)
             await Msg.response(
                 message, f"You will be notified in direct messages when reminder {index} is sent", silent)
         else:
@@ -247,6 +259,7 @@ class ReminderCommands(BaseCmd):
             await Msg.response(message, "Duration should be positive or zero (to disable repetition)!", silent)
             return
         bc.config.reminders[index].repeat_after = duration
+        bc.changelog.set(("reminders", index, "repeat_after"), duration)
         await Msg.response(message, f"Reminder {index} will be repeated every {duration} minutes!", silent)
 
     @staticmethod
@@ -275,6 +288,11 @@ class ReminderCommands(BaseCmd):
         bc.config.reminders[id_].repeat_after = rem.repeat_after
         bc.config.ids["reminder"] += 1
         bc.config.reminders.pop(index)
+        bc.changelog.set(("reminders", id_), bc.config.reminders[id_])
+        bc.changelog.set(("ids", "reminder"), bc.config.ids["reminder"])
+        bc.changelog.delete(("reminders", index))
+        bc.reminder_scheduler.cancel(index)
+        bc.reminder_scheduler.schedule(id_, bc.config.reminders[id_])
         await Msg.response(
             message, f"Skipped reminder {index} at {rem.time}, "
                      f"next reminder {id_} will be at {bc.config.reminders[id_].time}", silent)
@@ -4,6 +4,7 @@ import os
 
 from src import const
 from src.config import Command, bc, log
+from src.suggestions import SuggestionIndex
 
 
 class BaseCmd:
@@ -21,6 +22,24 @@ class Commands:
             self.data = dict()
         if not hasattr(self, "aliases"):
             self.aliases = dict()
+        self._suggestions = None
+
+    def __getstate__(self):
+        # Runtime-only fields (starting with underscore) are not saved to config
+        return {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+
+    def suggest(self, name, count=3):
+        """Get commands and aliases that are similar to name. Index is rebuilt if commands or aliases are changed"""
+        index = getattr(self, "_suggestions", None)
+        if index is None or not index.is_built_for(self.data.keys(), self.aliases.keys()):
+            index = self._suggestions = SuggestionIndex(self.data.keys(), self.aliases.keys())
+        return index.suggest(name, count)
+
+    def get_unknown_command_message(self, name):
+        suggestions = self.suggest(name)
+        if not suggestions:
+            return f"Unknown command '{name}'"
+        return f"Unknown command '{name}', probably you meant " + ", ".join(f"'{x}'" for x in suggestions)
 
     def update(self):
         bc.commands = self
@@ -4,13 +4,25 @@ import os
 import re
 import sys
 import threading
+import time
 import zipfile
 
-import yaml
-
 from src import const
+from src.budget import ExecutionBudget, ExecutionBudgetExceeded, current_budget
+from src.changelog import ChangeLog
+from src.emoji_index import EmojiIndex
+from src.external import ExternalCommandRunner
+from src.http_client import HttpClient
+from src.image_store import ImageStore
+from src.images import ImageCatalog
 from src.log import log
+from src.matcher import RegexMatcher
 from src.message import Msg
+from src.ratelimit import RateLimiter
+from src.reminder import ReminderScheduler
+from src.serialization import yaml_object
+from src.stats import Stats
+from src.template import Template, expand_subcommands
 from src.utils import Util
 
 
@@ -19,6 +31,17 @@ class BotController:
         self.background_events = []
         self.deployment_time = datetime.datetime.now()
         self.background_loop = None
+        self.changelog = ChangeLog()
+        self.external_commands = ExternalCommandRunner()
+        self.http = HttpClient()
+        self.emoji_index = EmojiIndex(const.EMOJI_INDEX_PATH)
+        self.images = ImageCatalog(const.IMAGES_DIRECTORY)
+        self.image_store = ImageStore(const.IMAGE_STORE_DIRECTORY)
+        self.responses_matcher = RegexMatcher()
+        self.reactions_matcher = RegexMatcher()
+        self.rate_limiter = RateLimiter()
+        self.reminder_scheduler = ReminderScheduler()
+        self.stats = Stats()
         self.commands = None
         self.config = None
         self.markov = None
@@ -29,7 +52,11 @@ class BotController:
 bc = BotController()
 
 
+@yaml_object
 class Command:
+    __slots__ = ("module_name", "class_name", "perform", "permission", "subcommand", "message", "cmd_line",
+                 "is_global", "channels", "times_called", "cache_ttl", "_template")
+
     def __init__(self, module_name=None, class_name=None,
                  perform=None, message=None, cmd_line=None, permission=0, subcommand=False):
         self.module_name = module_name
@@ -42,6 +69,9 @@ class Command:
         self.is_global = False
         self.channels = []
         self.times_called = 0
+        # Time to live of cached result of external command in seconds (0 - result is not cached)
+        self.cache_ttl = 0
+        self._template = None
 
     def is_available(self, channel_id):
         return self.is_global or (channel_id in self.channels)
@@ -52,74 +82,100 @@ class Command:
     def get_actor(self):
         return getattr(getattr(sys.modules[self.module_name], self.class_name), self.perform)
 
+    def get_template(self, source):
+        """Get parsed template for message or cmd_line. Template is re-parsed when source string is replaced"""
+        template = getattr(self, "_template", None)
+        if template is None or template.source is not source:
+            template = self._template = Template(source)
+        return template
+
     async def process_variables(self, string, message, command, safe=False):
-        string = string.replace("@author@", message.author.mention)
-        if not safe or const.ALNUM_STRING_REGEX.match(' '.join(command[1:])):
-            string = string.replace("@args@", ' '.join(command[1:]))
-            it = 0
-            while True:
-                res = const.ARGS_REGEX.search(string[it:])
-                if res is None:
-                    break
-                n1 = 1
-                n2 = len(command)
-                if res.group(1):
-                    n1 = int(res.group(1))
-                if res.group(2):
-                    n2 = int(res.group(2))+1
-                if not 0 < n1 < len(command) or not 0 < n2 <= len(command) or n1 > n2:
-                    it += res.end()
-                    continue
-                oldlen = len(string)
-                if not safe or const.ALNUM_STRING_REGEX.match(' '.join(command[n1:n2])):
-                    string = string.replace(res.group(0), ' '.join(command[n1:n2]), 1)
-                it += res.end()+len(string)-oldlen
-        for i in range(len(command)):
-            if not safe or const.ALNUM_STRING_REGEX.match(command[i]):
-                string = string.replace("@arg" + str(i) + "@", command[i])
-        return string
+        result = self.get_template(string).render(message.author.mention, command, safe)
+        budget = current_budget.get()
+        if budget is not None:
+            budget.check_length(result)
+        return result
 
     async def process_subcommands(self, content, message, user, safe=False):
-        command_indicators = {
-            ')': '(',
-            ']': '[',
-            '`': '`',
-            '}': '{',
-        }
-        while True:
-            updated = False
-            for i in range(len(content)):
-                if content[i] in command_indicators.keys():
-                    for j in range(i-1, 0, -1):
-                        if content[j] == command_indicators[content[i]] and content[j-1] == '$':
-                            updated = True
-                            message.content = content[j+1:i]
-                            command = message.content.split()
-                            if command[0] not in bc.config.commands.data.keys():
-                                if command[0] in bc.config.commands.aliases.keys():
-                                    command[0] = bc.config.commands.aliases[command[0]]
-                                else:
-                                    await message.channel.send(f"Unknown command '{command[0]}'")
-                            result = ""
-                            if command and command[0] in bc.commands.data.keys():
-                                log.debug(f"Processing subcommand: {command[0]}: {message.content}")
-                                cmd = bc.commands.data[command[0]]
-                                if cmd.can_be_subcommand():
-                                    result = await cmd.run(message, command, user, silent=True)
-                                    if result is None or (safe and not const.ALNUM_STRING_REGEX.match(content)):
-                                        result = ""
-                                else:
-                                    await message.channel.send(f"Command '{command[0]}' can not be used as subcommand")
-                            content = content[:j-1] + result + content[i+1:]
-                            log.debug2(f"Command (during processing subcommands): {content}")
-                            break
-                if updated:
-                    break
-            if not updated:
-                break
-        return content
+        budget = current_budget.get()
+
+        async def execute(subcommand):
+            if budget is not None:
+                budget.expand()
+                budget.check_length(subcommand)
+                # Let other tasks run between subcommands
+                await asyncio.sleep(0)
+            message.content = subcommand
+            command = message.content.split()
+            if not command:
+                return ""
+            if command[0] not in bc.config.commands.data.keys():
+                if command[0] in bc.config.commands.aliases.keys():
+                    command[0] = bc.config.commands.aliases[command[0]]
+                else:
+                    await message.channel.send(bc.commands.get_unknown_command_message(command[0]))
+            result = ""
+            if command[0] in bc.commands.data.keys():
+                log.debug(f"Processing subcommand: {command[0]}: {message.content}")
+                cmd = bc.commands.data[command[0]]
+                if cmd.can_be_subcommand():
+                    result = await cmd.run(message, command, user, silent=True)
+                    if result is None or (safe and not const.ALNUM_STRING_REGEX.match(result)):
+                        result = ""
+                else:
+                    await message.channel.send(f"Command '{command[0]}' can not be used as subcommand")
+            if budget is not None:
+                budget.check_length(result)
+            # Result of subcommand can contain subcommands too
+            if '$' in result:
+                result = await self.process_subcommands(result, message, user, safe)
+            log.debug2(f"Subcommand result: {result}")
+            return result
+
+        return await expand_subcommands(content, execute)
 
     async def run(self, message, command, user, silent=False):
+        name = command[0]
+        # Nested call (e.g. subcommand) shares budget with command invocation that started it
+        budget = current_budget.get()
+        token = None
+        if budget is None:
+            budget = ExecutionBudget.for_user(bc.config, user)
+            token = current_budget.set(budget)
+        start = time.perf_counter()
+        result = None
+        error = False
+        aborted = False
+        try:
+            budget.enter()
+            result = await self._run(message, command, user, silent)
+            return result
+        except ExecutionBudgetExceeded as e:
+            aborted = True
+            if token is None:
+                raise
+            log.warning(f"Command '{name}' is aborted: {e}")
+            await message.channel.send(f"Command '{name}' is aborted: {e}")
+        except Exception:
+            error = True
+            raise
+        finally:
+            budget.leave()
+            bc.stats.record_call(name, time.perf_counter() - start, result, error, aborted)
+            if token is not None:
+                current_budget.reset(token)
+
+    async def _expand_subcommands(self, name, content, message, user, safe=False):
+        if '$' not in content:
+            return content
+        start = time.perf_counter()
+        try:
+            return await self.process_subcommands(content, message, user, safe)
+        finally:
+            bc.stats.record_expansion(name, time.perf_counter() - start)
+
+    async def _run(self, message, command, user, silent=False):
+        name = command[0]
         log.debug(f"Processing command: {message.content}")
         if not self.is_available(message.channel.id):
             await message.channel.send(f"Command '{command[0]}' is not available in this channel")
@@ -130,7 +186,7 @@ class Command:
         self.times_called += 1
         if message.content.split(' ')[0][1:] not in ["addcmd", "addextcmd", "updcmd", "addbgevent"]:
             log.debug2(f"Command (before processing): {message.content}")
-            message.content = await self.process_subcommands(message.content, message, user)
+            message.content = await self._expand_subcommands(name, message.content, message, user)
             log.debug2(f"Command (after processing subcommands): {message.content}")
         else:
             log.debug2("Subcommands are not processed!")
@@ -143,7 +199,7 @@ class Command:
             log.debug2(f"Command (before processing): {response}")
             response = await self.process_variables(response, message, command)
             log.debug2(f"Command (after processing variables): {response}")
-            response = await self.process_subcommands(response, message, user)
+            response = await self._expand_subcommands(name, response, message, user)
             log.debug2(f"Command (after processing subcommands): {response}")
             if response:
                 if not silent:
@@ -151,13 +207,14 @@ class Command:
                         await message.channel.send(chunk)
                 return response
         elif self.cmd_line is not None:
-            cmd_line = self.cmd_line[:]
+            cmd_line = self.cmd_line
             log.debug2(f"Command (before processing): {cmd_line}")
             cmd_line = await self.process_variables(cmd_line, message, command, safe=True)
             log.debug2(f"Command (after processing variables): {cmd_line}")
-            cmd_line = await self.process_subcommands(cmd_line, message, user, safe=True)
+            cmd_line = await self._expand_subcommands(name, cmd_line, message, user, safe=True)
             log.debug2(f"Command (after processing subcommands): {cmd_line}")
-            return await Util.run_external_command(message, cmd_line, silent)
+            return await bc.external_commands.run(
+                message, cmd_line, silent, bc.config.external_commands, self.cache_ttl)
         else:
             await message.channel.send(f"Command '{command[0]}' is not callable")
 
@@ -171,6 +228,8 @@ class BackgroundEvent:
         self.task = bc.background_loop.create_task(self.run())
 
     async def run(self):
+        # Task inherits context of !addbgevent invocation, but every triggered command has its own budget
+        current_budget.set(None)
         command = self.message.content.split(' ')
         command = list(filter(None, command))
         command[0] = command[0][1:]
@@ -189,19 +248,31 @@ class BackgroundEvent:
         self.task.cancel()
 
 
+@yaml_object
 class Reaction:
+    __slots__ = ("regex", "emoji", "disabled")
+
     def __init__(self, regex, emoji):
         self.regex = regex
         self.emoji = emoji
+        self.disabled = False
 
 
+@yaml_object
 class Response:
+    __slots__ = ("regex", "text", "disabled")
+
     def __init__(self, regex, text):
         self.regex = regex
         self.text = text
+        self.disabled = False
 
 
+@yaml_object
 class GuildSettings:
+    __slots__ = ("id", "is_whitelisted", "whitelist", "markov_logging_whitelist", "markov_responses_whitelist",
+                 "responses_whitelist", "reactions_whitelist", "markov_pings")
+
     def __init__(self, id_):
         self.id = id_
         self.is_whitelisted = False
@@ -213,7 +284,10 @@ class GuildSettings:
         self.markov_pings = True
 
 
+@yaml_object
 class User:
+    __slots__ = ("id", "permission_level")
+
     def __init__(self, id_):
         self.id = id_
         self.permission_level = const.Permission.USER.value
@@ -242,11 +316,108 @@ class Config:
                 "compress": True,
                 "period": 10,
             },
+            "changelog": {
+                "enabled": True,
+                "period": 5,
+            },
             "period": 10,
         }
         self.repl = {
             "port": 8080,
         }
+        # Limits for single command invocation (keys are permission levels)
+        self.execution_budget = {
+            const.Permission.USER.value: {
+                "max_expansions": 50,
+                "max_depth": 8,
+                "max_length": 20000,
+                "time_slice": 5.0,
+            },
+            const.Permission.MOD.value: {
+                "max_expansions": 200,
+                "max_depth": 16,
+                "max_length": 100000,
+                "time_slice": 15.0,
+            },
+            const.Permission.ADMIN.value: {
+                "max_expansions": 1000,
+                "max_depth": 32,
+                "max_length": 1000000,
+                "time_slice": 60.0,
+            },
+        }
+        # Limits for external commands (!extexec and custom commands with command line)
+        self.external_commands = {
+            "timeout": 60,
+            "max_concurrent": 4,
+            "max_output": 100000,
+        }
+        # Shared HTTP client (!curl, image downloads)
+        self.http_client = {
+            "timeout": 30,
+            "connect_timeout": 10,
+            "max_connections": 32,
+            "max_connections_per_host": 4,
+            "max_body_size": 8 * 1024 * 1024,
+            # Cache of responses with ETag or Last-Modified header (entries are revalidated on every request)
+            "cache": {
+                "enabled": True,
+                "max_entries": 256,
+                "max_size": 64 * 1024 * 1024,
+            },
+        }
+        # Limits for evaluation of user-supplied regular expressions
+        self.regex_safety = {
+            # Response or reaction is disabled if matching of its regex takes more time (seconds) several times in a row
+            "max_match_time": 0.1,
+            # Time limit for !findmarkov and !delmarkov (seconds)
+            "search_timeout": 10.0,
+        }
+        # Lean discord client does not cache messages (MessageBuffer is the only storage of recent messages)
+        # and receives only guild and guild message events (no reactions, typing, voice, DM events, etc.).
+        # Users are not kept in cache after message is processed, so they are fetched from Discord API when needed
+        self.discord_client = {
+            "lean": True,
+        }
+        # Images are sent as downscaled and recompressed variants (if it is smaller than original)
+        self.image_variants = {
+            "enabled": True,
+            "max_dimension": 1024,
+            "jpeg_quality": 85,
+        }
+        # Token bucket rate limiting of commands (users with MOD or ADMIN permission level are not limited)
+        self.rate_limit = {
+            "enabled": True,
+            # Send "slow down" reply (once until limit is restored) or ignore throttled commands silently
+            "reply": True,
+            # Bucket capacity (burst size) and refill rate (tokens per second) for every scope
+            "user": {
+                "capacity": 5,
+                "rate": 0.5,
+            },
+            "channel": {
+                "capacity": 15,
+                "rate": 1.0,
+            },
+            "guild": {
+                "capacity": 30,
+                "rate": 2.0,
+            },
+            # Number of tokens that command invocation takes
+            "default_cost": 1,
+            "costs": {
+                "curl": 3,
+                "markov": 2,
+                "range": 2,
+            },
+        }
+
+    def get_user(self, user_id):
+        """Get user settings. Users with default permission level are not stored in config"""
+        user = self.users.get(user_id)
+        if user is None:
+            user = User(user_id)
+        return user
 
     def backup(self, *files):
         compress_type = zipfile.ZIP_DEFLATED if self.saving["backup"]["compress"] else zipfile.ZIP_STORED
@@ -256,8 +427,8 @@ class Config:
             name += "_" + datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
             backup_file = name + ext
             backup_archive = os.path.join(path, "backup", name + ext + ".zip")
-            if not os.path.exists("backup"):
-                os.makedirs("backup")
+            if not os.path.exists(os.path.dirname(backup_archive)):
+                os.makedirs(os.path.dirname(backup_archive))
             try:
                 with zipfile.ZipFile(backup_archive, mode='w') as zf:
                     zf.write(file, arcname=backup_file, compress_type=compress_type)
@@ -270,27 +441,26 @@ class Config:
         config_mutex = threading.Lock()
         config_mutex.acquire()
         log.info("Saving of config is started")
+        saved = False
         with open(config_file, 'wb') as f:
             try:
-                f.write(yaml.dump(
-                    self,
-                    Dumper=bc.yaml_dumper,
-                    encoding='utf-8',
-                    allow_unicode=True))
+                f.write(Util.dump_config(self, bc.yaml_dumper))
+                f.flush()
+                os.fsync(f.fileno())
+                saved = True
                 log.info("Saving of config is finished")
             except Exception:
                 log.error("yaml.dump failed", exc_info=True)
+        if saved:
+            # All changes from change log are in config.yaml now
+            bc.changelog.compact()
         config_mutex.release()
         secret_config_mutex = threading.Lock()
         secret_config_mutex.acquire()
         log.info("Saving of secret config is started")
         with open(secret_config_file, 'wb') as f:
             try:
-                f.write(yaml.dump(
-                    bc.secret_config,
-                    Dumper=bc.yaml_dumper,
-                    encoding='utf-8',
-                    allow_unicode=True))
+                f.write(Util.dump_config(bc.secret_config, bc.yaml_dumper))
                 log.info("Saving of secret config is finished")
             except Exception:
                 log.error("yaml.dump failed", exc_info=True)
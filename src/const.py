@@ -3,7 +3,7 @@ import re
 
 DISCORD_LIB_VERSION = '1.6.0'
 
-CONFIG_VERSION = '0.0.18'
+CONFIG_VERSION = '0.0.28'
 MARKOV_CONFIG_VERSION = '0.0.5'
 SECRET_CONFIG_VERSION = '0.0.1'
 
@@ -15,8 +15,15 @@ GIT_REPO_LINK = "https://github.com/aobolensk/walbot"
 CONFIG_PATH = "config.yaml"
 MARKOV_PATH = "markov.yaml"
 SECRET_CONFIG_PATH = "secret.yaml"
+CONFIG_CHANGELOG_PATH = "config.changelog"
 COMMANDS_DOC_PATH = "docs/Commands.md"
 LOGS_DIRECTORY = "logs"
+IMAGES_DIRECTORY = "images"
+IMAGE_STORE_DIRECTORY = "image_store"
+HTTP_CACHE_DIRECTORY = ".http_cache"
+EMOJI_INDEX_PATH = "emoji.idx"
+EMOJI_CHART_URL = "https://unicode.org/emoji/charts/full-emoji-list.html"
+EMOJI_CHART_TIMEOUT = 60
 
 MAX_POLL_OPTIONS = 20
 MAX_RANGE_ITERATIONS = 500
@@ -24,8 +31,11 @@ MAX_LOG_FILESIZE = 3 * 1024 * 1024
 DISCORD_MAX_EMBED_FILEDS_COUNT = 25
 DISCORD_MAX_MESSAGE_LENGTH = 2000
 MAX_MESSAGE_HISTORY_DEPTH = 1000
+IMAGES_LIST_PAGE_SIZE = 100
 MAX_MARKOV_ATTEMPTS = 64
-REMINDER_POLLING_INTERVAL = 30
+REMINDER_CLOCK_CHECK_INTERVAL = 60
+REMINDER_DELAY_NOTICE_THRESHOLD = 60
+REMINDER_MISSED_TIMEOUT = 24 * 60 * 60
 
 ALNUM_STRING_REGEX = re.compile('^[A-Za-zА-Яа-яЁё0-9 ]+$')
 FILENAME_REGEX = re.compile('^[A-Za-zА-Яа-яЁё0-9_-]+$')
@@ -36,8 +46,10 @@ EMOJI_REGEX = re.compile(r'<:(\w*):(\d*)>')
 USER_ID_REGEX = re.compile(r'<@!(\d*)>')
 ROLE_ID_REGEX = re.compile(r'<@&(\d*)>')
 INTEGER_NUMBER = re.compile(r'[-+]?\d+')
-ARGS_REGEX = re.compile(r'@args(\d*)-(\d*)@')
+TEMPLATE_VARIABLE_REGEX = re.compile(r'@author@|@args@|@args(\d*)-(\d*)@|@arg(\d+)@')
 REMINDER_IN_REGEX = re.compile(r'(([0-9]*)w)?(([0-9]*)d)?(([0-9])*h)?(([0-9])*m)?')
+CONFIG_VERSION_HEADER = "# version: "
+CONFIG_VERSION_HEADER_REGEX = re.compile(r'^# version: (\S+)$')
 
 ROLE_EVERYONE = "@everyone"
 ROLE_HERE = "@here"
@@ -0,0 +1,105 @@
+import base64
+import mmap
+import os
+import re
+import struct
+
+from src.log import log
+
+EMOJI_CHART_IMAGE_REGEX = re.compile(r"<img alt='([^']+)' class='imga' src='data:image/png;base64,([^']+)'>")
+# Chart contains images of several vendors for every emoji, Twemoji is located under the 4th number
+EMOJI_CHART_VENDOR_INDEX = 4
+
+# Index file layout:
+#   header: magic, number of entries
+#   entries: key length, key (UTF-8), offset of image, size of image
+#   images: PNG files one after another
+_MAGIC = b"WBEMOJI1"
+_HEADER = struct.Struct("<8sI")
+_ENTRY = struct.Struct("<HII")
+
+
+def parse_emoji_chart(page):
+    """Extract PNG images from Unicode emoji chart (full-emoji-list.html). Returns dict emoji -> PNG bytes"""
+    vendor_images = dict()
+    for match in EMOJI_CHART_IMAGE_REGEX.finditer(page):
+        vendor_images.setdefault(match.group(1), []).append(match.group(2))
+    result = dict()
+    for emoji, images in vendor_images.items():
+        image = images[EMOJI_CHART_VENDOR_INDEX] if len(images) > EMOJI_CHART_VENDOR_INDEX else images[0]
+        result[emoji] = base64.b64decode(image)
+    return result
+
+
+def write_emoji_index(path, images):
+    """Write emoji images to index file"""
+    keys = [(emoji.encode("utf-8"), emoji) for emoji in sorted(images.keys())]
+    offset = _HEADER.size + sum(_ENTRY.size + len(key) for key, _ in keys)
+    with open(path + ".new", 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(keys)))
+        for key, emoji in keys:
+            f.write(_ENTRY.pack(len(key), offset, len(images[emoji])))
+            f.write(key)
+            offset += len(images[emoji])
+        for _, emoji in keys:
+            f.write(images[emoji])
+    os.replace(path + ".new", path)
+
+
+class EmojiIndex:
+    """Read-only emoji image index. File is memory-mapped and its table is read on first lookup"""
+
+    def __init__(self, path):
+        self._path = path
+        self._mtime = None
+        self._mmap = None
+        self._entries = None
+
+    def _load(self):
+        try:
+            mtime = os.stat(self._path).st_mtime
+        except OSError:
+            self._close()
+            return False
+        if self._mmap is not None and mtime == self._mtime:
+            return True
+        self._close()
+        with open(self._path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            log.error(f"File '{self._path}' is not an emoji index")
+            data.close()
+            return False
+        entries = dict()
+        position = _HEADER.size
+        for _ in range(count):
+            key_length, offset, size = _ENTRY.unpack_from(data, position)
+            position += _ENTRY.size
+            entries[data[position:position + key_length].decode("utf-8")] = (offset, size)
+            position += key_length
+        self._mmap = data
+        self._mtime = mtime
+        self._entries = entries
+        log.debug(f"Loaded emoji index '{self._path}': {count} emojis")
+        return True
+
+    def _close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._entries = None
+        self._mtime = None
+
+    def is_available(self):
+        return self._load()
+
+    def get(self, emoji):
+        """Get PNG image of emoji. Returns None if emoji is not found or index is not built"""
+        if not self._load():
+            return None
+        entry = self._entries.get(emoji)
+        if entry is None:
+            return None
+        offset, size = entry
+        return self._mmap[offset:offset + size]
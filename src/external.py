@@ -0,0 +1,216 @@
+import asyncio
+import codecs
+import os
+import signal
+import sys
+import threading
+import time
+
+from src import const
+from src.log import log
+from src.message import Msg
+from src.stats import Histogram
+
+# Size of blocks that are read from stdout of external command
+READ_BLOCK_SIZE = 4096
+
+
+class _OutputStream:
+    """Collects output of external command and sends it to the channel by chunks as soon as they are ready"""
+
+    def __init__(self, message, silent, max_output):
+        self.message = message
+        self.silent = silent
+        self.max_output = max_output
+        self.result = []
+        self.length = 0
+        self.pending = ""
+        self.truncated = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async def read_from(self, stream):
+        while not self.truncated:
+            block = await stream.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            await self._add(self._decoder.decode(block))
+        await self._add(self._decoder.decode(b'', final=True))
+
+    async def _add(self, text):
+        if not text:
+            return
+        if self.length + len(text) > self.max_output:
+            text = text[:self.max_output - self.length]
+            self.truncated = True
+        self.result.append(text)
+        self.length += len(text)
+        if self.silent:
+            return
+        self.pending += text
+        while len(self.pending) >= const.DISCORD_MAX_MESSAGE_LENGTH:
+            chunk = self.pending[:const.DISCORD_MAX_MESSAGE_LENGTH]
+            # Prefer to split output by lines
+            split_index = chunk.rfind('\n') + 1 or len(chunk)
+            await self.message.channel.send(self.pending[:split_index])
+            self.pending = self.pending[split_index:]
+
+    async def flush(self):
+        if not self.silent and self.pending.strip():
+            await self.message.channel.send(self.pending)
+        self.pending = ""
+
+
+class _CacheEntry:
+    __slots__ = ("result", "created", "expires")
+
+    def __init__(self, result, created, expires):
+        self.result = result
+        self.created = created
+        self.expires = expires
+
+
+class ExternalCommandRunner:
+    """Runs external commands as asyncio subprocesses, so they do not block the event loop"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self._max_concurrent = None
+        self._cache = dict()
+        self._in_flight = dict()
+        self.reset_counters()
+
+    def _get_semaphore(self, max_concurrent):
+        if self._semaphore is None or self._max_concurrent != max_concurrent:
+            self._semaphore = asyncio.Semaphore(max_concurrent)
+            self._max_concurrent = max_concurrent
+        return self._semaphore
+
+    @staticmethod
+    def _kill(process):
+        if process.returncode is not None:
+            return
+        try:
+            if sys.platform != "win32":
+                # Shell is started in new session, so its children are killed too
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    async def _execute(self, cmd_line, settings, output):
+        """Execute shell command writing its output to output stream.
+        Returns output (empty string if command failed) and notice for user (None if command succeeded)"""
+        log.debug(f"Processing external command: '{cmd_line}'")
+        kwargs = {"start_new_session": True} if sys.platform != "win32" else {}
+        async with self._get_semaphore(settings["max_concurrent"]):
+            start = time.perf_counter()
+            process = await asyncio.create_subprocess_shell(
+                cmd_line, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL, **kwargs)
+            timed_out = False
+            try:
+                await asyncio.wait_for(output.read_from(process.stdout), settings["timeout"])
+                if output.truncated:
+                    self._kill(process)
+                await asyncio.wait_for(process.wait(), max(settings["timeout"] - (time.perf_counter() - start), 0))
+            except asyncio.TimeoutError:
+                timed_out = True
+                self._kill(process)
+                await process.wait()
+            finally:
+                self._kill(process)
+            elapsed = time.perf_counter() - start
+        log.debug(f"External command '{cmd_line}' finished execution with return code: {process.returncode} "
+                  f"in {elapsed:.3f}s")
+        await output.flush()
+        failed = not timed_out and not output.truncated and process.returncode != 0
+        with self._lock:
+            self.run_time.add(elapsed)
+            self.timeouts += int(timed_out)
+            self.truncated += int(output.truncated)
+            self.failures += int(failed)
+        if timed_out:
+            return "", f"<Command timed out after {settings['timeout']}s>"
+        if output.truncated:
+            return ''.join(output.result), f"<Output is truncated to {settings['max_output']} characters>"
+        if failed:
+            return "", f"<Command failed with error code {process.returncode}>"
+        return ''.join(output.result), None
+
+    async def run(self, message, cmd_line, silent, settings, cache_ttl=0):
+        """Execute shell command and send its output. Returns output or empty string if command failed.
+        If cache_ttl is positive, result is cached for cache_ttl seconds and concurrent invocations of the same
+        command line share one process"""
+        if cache_ttl > 0:
+            result, notice = await self._run_cached(cmd_line, settings, cache_ttl)
+            await Msg.response(message, result, silent)
+        else:
+            output = _OutputStream(message, silent, settings["max_output"])
+            result, notice = await self._execute(cmd_line, settings, output)
+        if notice is not None:
+            await Msg.response(message, notice, silent)
+        return result
+
+    async def _run_cached(self, cmd_line, settings, cache_ttl):
+        now = time.monotonic()
+        entry = self._cache.get(cmd_line)
+        if entry is not None and entry.expires > now:
+            self.cache_hits += 1
+            return entry.result, None
+        task = self._in_flight.get(cmd_line)
+        if task is None:
+            self.cache_misses += 1
+            task = self._in_flight[cmd_line] = asyncio.ensure_future(
+                self._execute(cmd_line, settings, _OutputStream(None, True, settings["max_output"])))
+            task.add_done_callback(lambda t: self._store(cmd_line, cache_ttl, t))
+        else:
+            self.cache_shared += 1
+        # Shield shared process from cancellation of one of invocations that wait for it
+        return await asyncio.shield(task)
+
+    def _store(self, cmd_line, cache_ttl, task):
+        self._in_flight.pop(cmd_line, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result, notice = task.result()
+        if notice is None:
+            now = time.monotonic()
+            for key in [key for key, entry in self._cache.items() if entry.expires <= now]:
+                del self._cache[key]
+            self._cache[cmd_line] = _CacheEntry(result, now, now + cache_ttl)
+
+    def flush_cache(self):
+        """Drop all cached results. Returns number of dropped entries"""
+        count = len(self._cache)
+        self._cache = dict()
+        return count
+
+    def cache_report(self):
+        now = time.monotonic()
+        result = (f"Cache: entries: {len(self._cache)}, hits: {self.cache_hits}, misses: {self.cache_misses}, "
+                  f"shared runs: {self.cache_shared}, in flight: {len(self._in_flight)}\n")
+        for cmd_line, entry in sorted(self._cache.items(), key=lambda x: x[1].created):
+            if entry.expires > now:
+                result += (f"`{cmd_line}`: {len(entry.result)} chars, age: {now - entry.created:.0f}s, "
+                           f"expires in: {entry.expires - now:.0f}s\n")
+        return result
+
+    def reset_counters(self):
+        with self._lock:
+            self.run_time = Histogram()
+            self.timeouts = 0
+            self.failures = 0
+            self.truncated = 0
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cache_shared = 0
+
+    def report(self):
+        with self._lock:
+            runs = self.run_time.count
+            if runs == 0:
+                return "External commands: no runs"
+            return (f"External commands: runs: {runs}, failures: {self.failures}, timeouts: {self.timeouts}, "
+                    f"truncated: {self.truncated}, avg: {self.run_time.total / runs * 1000:.1f}ms, "
+                    f"p95: <={self.run_time.percentile(95) * 1000:.0f}ms, max: {self.run_time.max * 1000:.1f}ms")
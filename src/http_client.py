@@ -0,0 +1,241 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import aiohttp
+
+from src import const
+from src.log import log
+from src.stats import Histogram
+
+# Size of blocks that are read from response body
+READ_CHUNK_SIZE = 64 * 1024
+USER_AGENT = "Mozilla/5.0"
+
+
+class HttpError(Exception):
+    """Raised when HTTP request fails (network error, timeout, error status or too large response body)"""
+    pass
+
+
+class HttpResponse:
+    """Downloaded response. Body is stored in file located at path"""
+
+    __slots__ = ("url", "status", "path", "size", "charset", "from_cache", "_temporary")
+
+    def __init__(self, url, status, path, size, charset, from_cache, temporary):
+        self.url = url
+        self.status = status
+        self.path = path
+        self.size = size
+        self.charset = charset
+        self.from_cache = from_cache
+        self._temporary = temporary
+
+    def text(self):
+        with open(self.path, 'rb') as f:
+            return f.read().decode(self.charset or "utf-8", errors="replace")
+
+    def save(self, path):
+        """Place body to path (temporary file is moved, cached file is copied)"""
+        if self._temporary:
+            shutil.move(self.path, path)
+            self._temporary = False
+        else:
+            shutil.copyfile(self.path, path)
+        self.path = path
+
+    def release(self):
+        if self._temporary:
+            os.remove(self.path)
+            self._temporary = False
+
+
+class _CacheEntry:
+    __slots__ = ("path", "size", "charset", "etag", "last_modified", "last_used")
+
+    def __init__(self, path, size, charset, etag, last_modified):
+        self.path = path
+        self.size = size
+        self.charset = charset
+        self.etag = etag
+        self.last_modified = last_modified
+        self.last_used = time.monotonic()
+
+
+class HttpClient:
+    """Shared asynchronous HTTP client with connection pooling.
+    Response bodies are streamed to disk. Responses with ETag or Last-Modified header are cached
+    and revalidated with conditional requests"""
+
+    def __init__(self, cache_directory=const.HTTP_CACHE_DIRECTORY):
+        self._cache_directory = cache_directory
+        self._cache_directory_ready = False
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_key = None
+        self._cache = dict()
+        self._cache_size = 0
+        self.reset_counters()
+
+    async def _get_session(self, settings):
+        loop = asyncio.get_event_loop()
+        key = (loop, settings["max_connections"], settings["max_connections_per_host"])
+        if self._session is None or self._session.closed or self._session_key != key:
+            if self._session is not None and not self._session.closed and self._session_key[0] is loop:
+                await self._session.close()
+            connector = aiohttp.TCPConnector(
+                limit=settings["max_connections"], limit_per_host=settings["max_connections_per_host"])
+            self._session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT})
+            self._session_key = key
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _prepare_cache_directory(self):
+        if self._cache_directory_ready:
+            return
+        # Cache index is not persisted, so files that are left from previous runs are useless
+        shutil.rmtree(self._cache_directory, ignore_errors=True)
+        os.makedirs(self._cache_directory, exist_ok=True)
+        self._cache_directory_ready = True
+
+    async def get(self, url, settings):
+        """Perform GET request. Returns HttpResponse: body is located in cache or in temporary file
+        that should be saved or released by caller"""
+        self._prepare_cache_directory()
+        cache_enabled = settings["cache"]["enabled"]
+        entry = self._cache.get(url) if cache_enabled else None
+        headers = dict()
+        if entry is not None:
+            if entry.etag is not None:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None:
+                headers["If-Modified-Since"] = entry.last_modified
+        timeout = aiohttp.ClientTimeout(total=settings["timeout"], sock_connect=settings["connect_timeout"])
+        session = await self._get_session(settings)
+        start = time.perf_counter()
+        log.debug(f"HTTP GET {url}")
+        try:
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                if response.status == 304 and entry is not None:
+                    entry.last_used = time.monotonic()
+                    self._record(start, hit=True)
+                    return HttpResponse(url, 200, entry.path, entry.size, entry.charset, True, False)
+                if response.status >= 400:
+                    raise HttpError(f"HTTP {response.status} {response.reason}")
+                path, size = await self._read_body(response, settings["max_body_size"])
+                result = HttpResponse(url, response.status, path, size, response.charset, False, True)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except aiohttp.InvalidURL:
+            self._record(start, error=True)
+            raise HttpError(f"Incorrect URL: {url}")
+        except asyncio.TimeoutError:
+            self._record(start, error=True)
+            raise HttpError(f"Request timed out after {settings['timeout']}s")
+        except aiohttp.ClientError as e:
+            self._record(start, error=True)
+            raise HttpError(f"Connection error: {e}")
+        except HttpError:
+            self._record(start, error=True)
+            raise
+        self._record(start, size=size)
+        cacheable = etag is not None or last_modified is not None
+        if cache_enabled and cacheable and size <= settings["cache"]["max_size"]:
+            self._store(url, result, etag, last_modified, settings["cache"])
+        return result
+
+    async def _read_body(self, response, max_body_size):
+        if response.content_length is not None and response.content_length > max_body_size:
+            raise HttpError(f"Response body is too large ({response.content_length} bytes, "
+                            f"limit is {max_body_size} bytes)")
+        fd, path = tempfile.mkstemp(dir=self._cache_directory, suffix=".part")
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_body_size:
+                        raise HttpError(f"Response body is too large (limit is {max_body_size} bytes)")
+                    f.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, size
+
+    def _store(self, url, response, etag, last_modified, settings):
+        old_entry = self._cache.pop(url, None)
+        if old_entry is not None:
+            self._remove_entry(old_entry)
+        path = os.path.join(self._cache_directory, uuid.uuid4().hex)
+        shutil.copyfile(response.path, path)
+        self._cache[url] = _CacheEntry(path, response.size, response.charset, etag, last_modified)
+        self._cache_size += response.size
+        # Evict least recently used entries
+        if len(self._cache) > settings["max_entries"] or self._cache_size > settings["max_size"]:
+            for key, entry in sorted(self._cache.items(), key=lambda x: x[1].last_used):
+                if len(self._cache) <= settings["max_entries"] and self._cache_size <= settings["max_size"]:
+                    break
+                del self._cache[key]
+                self._remove_entry(entry)
+
+    def _remove_entry(self, entry):
+        self._cache_size -= entry.size
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+    async def download(self, url, path, settings):
+        """Download response body to file located at path"""
+        response = await self.get(url, settings)
+        response.save(path)
+        return response
+
+    async def get_text(self, url, settings):
+        """Get response body as text"""
+        response = await self.get(url, settings)
+        try:
+            return response.text()
+        finally:
+            response.release()
+
+    def flush_cache(self):
+        """Drop all cached responses. Returns number of dropped entries"""
+        count = len(self._cache)
+        for entry in self._cache.values():
+            self._remove_entry(entry)
+        self._cache = dict()
+        return count
+
+    def _record(self, start, size=0, hit=False, error=False):
+        with self._lock:
+            self.request_time.add(time.perf_counter() - start)
+            self.downloaded += size
+            self.cache_hits += int(hit)
+            self.errors += int(error)
+
+    def reset_counters(self):
+        with self._lock:
+            self.request_time = Histogram()
+            self.downloaded = 0
+            self.cache_hits = 0
+            self.errors = 0
+
+    def report(self):
+        with self._lock:
+            requests = self.request_time.count
+            if requests == 0:
+                return "HTTP requests: no requests"
+            return (f"HTTP requests: {requests}, errors: {self.errors}, cache hits: {self.cache_hits}, "
+                    f"downloaded: {self.downloaded} bytes, cached: {len(self._cache)} responses "
+                    f"({self._cache_size} bytes), avg: {self.request_time.total / requests * 1000:.1f}ms, "
+                    f"max: {self.request_time.max * 1000:.1f}ms")
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import importlib
+import os
+import threading
+
+from src.log import log
+
+# Size of blocks that are read from image file while hashing
+HASH_BLOCK_SIZE = 1024 * 1024
+EXIF_ORIENTATION_TAG = 0x0112
+_pil_image = None
+
+
+def _get_pil():
+    """Get PIL.Image module. Pillow is imported on first call. Returns None if Pillow is not available"""
+    global _pil_image
+    if _pil_image is None:
+        try:
+            _pil_image = importlib.import_module("PIL.Image")
+        except ImportError as e:
+            log.warning(f"Pillow is not available ({e}), images are sent without optimization")
+            _pil_image = False
+    return _pil_image or None
+
+
+class ImageStore:
+    """Content-addressed store of images.
+    Originals are kept under objects/<sha256> (identical uploads share one file via hard links, link count is
+    the number of references; if file system does not support hard links, images are not deduplicated),
+    size-capped variants are kept under variants/<sha256>-<max_dimension>-<jpeg_quality>.<ext>, so changing
+    variant settings generates new variants. Empty variants/<sha256>-<max_dimension>-<jpeg_quality> file means that
+    original is sent as is (image is animated, already small or can not be decoded)"""
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._objects = os.path.join(directory, "objects")
+        self._variants = os.path.join(directory, "variants")
+        # (path, mtime, size) -> digest
+        self._digests = dict()
+        # variant key -> path of variant ("" if original is sent as is), loaded from disk on first use
+        self._variant_index = None
+        self._pending = dict()
+        # Variants are generated in executor threads
+        self._variant_lock = threading.Lock()
+
+    def _digest_key(self, path):
+        st = os.stat(path)
+        return path, st.st_mtime_ns, st.st_size
+
+    def digest(self, path):
+        """Get SHA-256 of file content (cached until file is modified). Hashing blocks, so call it in executor"""
+        key = self._digest_key(path)
+        result = self._digests.get(key)
+        if result is None:
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    h.update(block)
+            result = self._digests[key] = h.hexdigest()
+        return result
+
+    def _link(self, src, dst):
+        """Returns False if hard link can not be created"""
+        try:
+            os.link(src, dst)
+            return True
+        except OSError as e:
+            log.warning(f"Failed to create hard link {dst} -> {src}, image is not deduplicated: {e}")
+            return False
+
+    def add(self, path, settings):
+        """Put image file to store and generate its variant (if variants are enabled).
+        If identical image is already stored, file at path is replaced with link to stored one.
+        Returns True if image is a duplicate"""
+        os.makedirs(self._objects, exist_ok=True)
+        digest = self.digest(path)
+        object_path = os.path.join(self._objects, digest)
+        duplicate = os.path.exists(object_path)
+        source = object_path
+        if duplicate:
+            if self._link(object_path, path + ".new"):
+                os.replace(path + ".new", path)
+            else:
+                source = path
+        elif not self._link(path, object_path):
+            # Object is not stored, so collect() never removes variants of this image
+            source = path
+        if settings["enabled"]:
+            self._make_variant(digest, source, settings)
+        return duplicate
+
+    def collect(self, digest):
+        """Remove stored image and its variants if no image in images directory refers to it"""
+        object_path = os.path.join(self._objects, digest)
+        with self._variant_lock:
+            try:
+                if os.stat(object_path).st_nlink > 1:
+                    return
+                os.remove(object_path)
+            except FileNotFoundError:
+                # Image is not stored (hard links are not supported), other images may use its variants
+                return
+            index = self._get_variant_index()
+            for key in [key for key in index.keys() if key == digest or key.startswith(digest + "-")]:
+                variant = index.pop(key)
+                try:
+                    os.remove(variant or os.path.join(self._variants, key))
+                except FileNotFoundError:
+                    pass
+
+    def _get_variant_index(self):
+        if self._variant_index is None:
+            self._variant_index = dict()
+            if os.path.isdir(self._variants):
+                for entry in os.scandir(self._variants):
+                    key, ext = os.path.splitext(entry.name)
+                    if ext == ".new":
+                        os.remove(entry.path)
+                    else:
+                        self._variant_index[key] = entry.path if ext else ""
+        return self._variant_index
+
+    @staticmethod
+    def _variant_key(digest, settings):
+        return f"{digest}-{settings['max_dimension']}-{settings['jpeg_quality']}"
+
+    def _find_variant(self, digest, settings):
+        """Returns path to variant, empty string if original should be sent or None if variant is not generated"""
+        return self._get_variant_index().get(self._variant_key(digest, settings))
+
+    def _make_variant(self, digest, path, settings):
+        with self._variant_lock:
+            return self._make_variant_locked(digest, path, settings)
+
+    def _make_variant_locked(self, digest, path, settings):
+        variant = self._find_variant(digest, settings)
+        if variant is not None:
+            return variant
+        image_module = _get_pil()
+        if image_module is None:
+            return ""
+        key = self._variant_key(digest, settings)
+        os.makedirs(self._variants, exist_ok=True)
+        variant = ""
+        rotated = False
+        try:
+            with image_module.open(path) as image:
+                if not getattr(image, "is_animated", False):
+                    # Variant is saved without EXIF, so orientation is applied to pixels
+                    rotated = image.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1
+                    image = importlib.import_module("PIL.ImageOps").exif_transpose(image)
+                    image.thumbnail((settings["max_dimension"], settings["max_dimension"]))
+                    if image.mode in ("RGBA", "LA", "P"):
+                        variant, params = os.path.join(self._variants, key + ".png"), {"optimize": True}
+                        image.save(variant + ".new", "PNG", **params)
+                    else:
+                        variant, params = os.path.join(self._variants, key + ".jpg"), {
+                            "quality": settings["jpeg_quality"], "optimize": True}
+                        image.convert("RGB").save(variant + ".new", "JPEG", **params)
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to generate optimized variant of image {path}: {e}")
+            if variant and os.path.exists(variant + ".new"):
+                os.remove(variant + ".new")
+            variant = ""
+        if variant and not rotated and os.path.getsize(variant + ".new") >= os.path.getsize(path):
+            # Optimized variant is not smaller than original
+            os.remove(variant + ".new")
+            variant = ""
+        if variant:
+            os.replace(variant + ".new", variant)
+            log.debug(f"Generated variant of image {path}: {os.path.getsize(path)} -> "
+                      f"{os.path.getsize(variant)} bytes")
+        else:
+            open(os.path.join(self._variants, key), 'wb').close()
+        self._get_variant_index()[key] = variant
+        return variant
+
+    def _get_variant(self, path, settings):
+        return self._make_variant(self.digest(path), path, settings)
+
+    async def get_upload_path(self, path, settings):
+        """Get path of file that should be uploaded instead of image located at path (variant or original).
+        Variant is generated in executor if it does not exist yet"""
+        if not settings["enabled"] or _get_pil() is None:
+            return path
+        # Image is hashed in executor unless its digest is already known
+        digest = self._digests.get(self._digest_key(path))
+        variant = self._find_variant(digest, settings) if digest is not None else None
+        if variant is None:
+            future = self._pending.get(path)
+            if future is None:
+                future = self._pending[path] = asyncio.get_event_loop().run_in_executor(
+                    None, self._get_variant, path, settings)
+                future.add_done_callback(lambda _: self._pending.pop(path, None))
+            variant = await asyncio.shield(future)
+        return variant or path
@@ -0,0 +1,113 @@
+import os
+import random
+
+from src.log import log
+
+
+class ImageInfo:
+    __slots__ = ("name", "path", "type", "size")
+
+    def __init__(self, name, path, type_, size):
+        self.name = name
+        self.path = path
+        self.type = type_
+        self.size = size
+
+
+class ImageCatalog:
+    """In-memory catalog of images directory (lowercase name -> ImageInfo).
+    Catalog is updated by add() and remove(), and it is rebuilt if mtime of images directory changes"""
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._mtime = None
+        self._images = dict()
+        # List of keys for random choice, positions are used for O(1) removal
+        self._keys = []
+        self._positions = dict()
+        self._sorted_names = None
+
+    def _directory_mtime(self):
+        try:
+            return os.stat(self._directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def _revalidate(self):
+        mtime = self._directory_mtime()
+        if mtime != self._mtime:
+            self._scan(mtime)
+
+    def _scan(self, mtime):
+        self._images = dict()
+        self._keys = []
+        self._positions = dict()
+        self._sorted_names = None
+        if mtime is not None:
+            with os.scandir(self._directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        name, ext = os.path.splitext(entry.name)
+                        self._insert(ImageInfo(name, entry.path, ext[1:].lower(), entry.stat().st_size))
+        self._mtime = mtime
+        log.debug(f"Image catalog is built: {len(self._images)} images")
+
+    def _insert(self, info):
+        key = info.name.lower()
+        if key not in self._images:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+        self._images[key] = info
+        self._sorted_names = None
+
+    def refresh(self):
+        """Rebuild catalog from images directory"""
+        self._scan(self._directory_mtime())
+
+    def get(self, name):
+        """Get image by name (case insensitive). Returns None if image is not found"""
+        self._revalidate()
+        return self._images.get(name.lower())
+
+    def random(self):
+        """Get random image. Returns None if there are no images"""
+        self._revalidate()
+        if not self._keys:
+            return None
+        return self._images[random.choice(self._keys)]
+
+    def names(self):
+        """Get sorted list of image names"""
+        self._revalidate()
+        if self._sorted_names is None:
+            self._sorted_names = sorted(info.name for info in self._images.values())
+        return self._sorted_names
+
+    def __len__(self):
+        self._revalidate()
+        return len(self._images)
+
+    def add(self, name, path):
+        """Register image file that is added to images directory"""
+        self._revalidate()
+        _, ext = os.path.splitext(path)
+        self._insert(ImageInfo(name, path, ext[1:].lower(), os.path.getsize(path)))
+        self._mtime = self._directory_mtime()
+
+    def remove(self, name):
+        """Remove image file and unregister it. Returns False if image is not found"""
+        self._revalidate()
+        key = name.lower()
+        info = self._images.pop(key, None)
+        if info is None:
+            return False
+        os.remove(info.path)
+        # Move last key to the place of removed one
+        position = self._positions.pop(key)
+        last_key = self._keys.pop()
+        if last_key != key:
+            self._keys[position] = last_key
+            self._positions[last_key] = position
+        self._sorted_names = None
+        self._mtime = self._directory_mtime()
+        return True
@@ -44,6 +44,42 @@ class Launcher:
         subparsers["patch"].add_argument(
             "file", nargs='?', default="all",
             help='Config file to patch', choices=["all", *self.config_files])
+        # Emoji index
+        subparsers["emojis"].add_argument(
+            "-s", "--source", default=const.EMOJI_CHART_URL,
+            help="Path or URL of Unicode emoji chart (full-emoji-list.html)")
+        subparsers["emojis"].add_argument(
+            "-o", "--out_file", default=const.EMOJI_INDEX_PATH, help="Path to output file")
+        # Benchmark
+        subparsers["bench"].add_argument(
+            "suite", nargs='?', default="all", help="Benchmark suite to run",
+            choices=["all", "persistence", "subcommands", "levenshtein", "client"])
+        subparsers["bench"].add_argument(
+            "-o", "--out_file", default=None, help="Path to output JSON file (stdout by default)")
+        subparsers["bench"].add_argument("--repeat", type=int, default=3, help="Number of runs for each measurement")
+        subparsers["bench"].add_argument("--seed", type=int, default=0, help="Seed for synthetic data generator")
+        subparsers["bench"].add_argument("--reminders", type=int, default=1000, help="Number of reminders")
+        subparsers["bench"].add_argument("--quotes", type=int, default=1000, help="Number of quotes")
+        subparsers["bench"].add_argument("--reactions", type=int, default=100, help="Number of reactions and responses")
+        subparsers["bench"].add_argument("--users", type=int, default=1000, help="Number of users")
+        subparsers["bench"].add_argument("--guilds", type=int, default=100, help="Number of guilds")
+        subparsers["bench"].add_argument("--markov_nodes", type=int, default=10000, help="Number of Markov model nodes")
+        subparsers["bench"].add_argument(
+            "--subcommand_depth", type=int, default=500, help="Nesting depth of subcommands")
+        subparsers["bench"].add_argument(
+            "--subcommand_count", type=int, default=2000, help="Number of subcommands in long flat input")
+        subparsers["bench"].add_argument(
+            "--levenshtein_queries", type=int, default=20, help="Number of queries for Levenshtein distance")
+        subparsers["bench"].add_argument(
+            "--levenshtein_commands", type=int, default=100, help="Number of command names for Levenshtein distance")
+        subparsers["bench"].add_argument(
+            "--max_distance", type=int, default=2, help="Distance cutoff for Levenshtein distance")
+        subparsers["bench"].add_argument(
+            "--client_guilds", type=int, default=1000, help="Number of guilds for discord client memory benchmark")
+        subparsers["bench"].add_argument(
+            "--client_channels", type=int, default=5, help="Number of text channels in every guild")
+        subparsers["bench"].add_argument(
+            "--client_messages", type=int, default=5, help="Number of messages that are sent to every channel")
         self.args = self._parser.parse_args()
         if self.args.action is None:
             self._parser.print_help()
@@ -56,24 +92,30 @@ class Launcher:
 
     def stop(self):
         """Stop the bot"""
-        importlib.import_module("src.bot").stop(self.args)
+        importlib.import_module("src.process").stop(self.args)
 
     def restart(self):
         """Restart the bot"""
-        bot = importlib.import_module("src.bot")
-        bot.stop(self.args)
-        bot.start(self.args)
+        importlib.import_module("src.process").stop(self.args)
+        importlib.import_module("src.bot").start(self.args)
 
     def suspend(self):
         """Stop the main bot and start mini-bot"""
-        bot = importlib.import_module("src.bot")
-        bot.stop(self.args)
-        bot.start(self.args, main_bot=False)
+        importlib.import_module("src.process").stop(self.args)
+        importlib.import_module("src.minibot").start(self.args)
 
     def docs(self):
         """Generate command docs"""
         importlib.import_module("tools.docs").main(self.args)
 
+    def emojis(self):
+        """Build local emoji image index"""
+        importlib.import_module("tools.emojis").main(self.args)
+
+    def bench(self):
+        """Run benchmarks"""
+        importlib.import_module("tools.benchmark").main(self.args)
+
     def help(self):
         """Print help message"""
         self._parser.print_help()
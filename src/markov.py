@@ -1,11 +1,12 @@
 import random
-import re
 
 import yaml
 
 from src import const
 from src.config import bc
 from src.log import log
+from src.regex_safety import search_words
+from src.utils import Util
 
 
 class MarkovNode:
@@ -66,18 +67,20 @@ class Markov:
         if current_node != self.model[""]:
             current_node.add_next(None)
 
-    def del_words(self, regex):
+    async def del_words(self, regex, timeout):
+        matched = set(await search_words(regex, self.model.keys(), timeout))
         removed = []
-        for word in [word for word in self.model if re.search(regex, word)]:
+        for word in [word for word in matched if word in self.model]:
             removed.append(self.model[word].word)
             del self.model[word]
         for _, node in self.model.items():
-            for word in [word for word in node.next if word is not None and re.search(regex, word)]:
+            for word in [word for word in node.next if word in matched]:
                 node.del_next(word)
         return removed
 
-    def find_words(self, regex):
-        return [self.model[word].word for word in self.model if re.search(regex, word)]
+    async def find_words(self, regex, timeout):
+        matched = await search_words(regex, self.model.keys(), timeout)
+        return [self.model[word].word for word in matched if word in self.model]
 
     def get_next_words_list(self, word):
         if word not in self.model.keys():
@@ -130,7 +133,7 @@ class Markov:
 
     def serialize(self, filename, dumper=yaml.Dumper):
         with open(filename, 'wb') as markov_file:
-            markov_file.write(yaml.dump(self, Dumper=dumper, encoding='utf-8', allow_unicode=True))
+            markov_file.write(Util.dump_config(self, dumper))
         log.info("Saving of Markov module data is finished")
 
     def check(self):
@@ -0,0 +1,182 @@
+import re
+import sre_constants
+import sre_parse
+import time
+
+from src.log import log
+from src.regex_safety import check_regex
+
+# Length of literal prefixes that are used to find candidate regexes
+NGRAM_LENGTH = 3
+# Number of consecutive slow matches after which entry is disabled (single slow match can be caused by GC pause
+# or contention with executor threads)
+SLOW_MATCHES_TO_DISABLE = 3
+
+
+def required_literal(parsed):
+    """Find the longest literal string that must be present in every match of parsed regex"""
+    best = ""
+    current = ""
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            current += chr(av)
+            continue
+        best = max(best, current, key=len)
+        current = ""
+        if op == sre_constants.SUBPATTERN:
+            # Group content is matched as is (flags that are set for group may change case sensitivity)
+            if not av[1] and not av[2]:
+                best = max(best, required_literal(av[-1]), key=len)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            best = max(best, required_literal(av[2]), key=len)
+    return max(best, current, key=len)
+
+
+def _has_group_references(parsed):
+    for op, av in parsed:
+        if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return True
+        for item in (av if isinstance(av, (tuple, list)) else (av,)):
+            if isinstance(item, sre_parse.SubPattern) and _has_group_references(item):
+                return True
+            if isinstance(item, list) and any(
+                    isinstance(x, sre_parse.SubPattern) and _has_group_references(x) for x in item):
+                return True
+    return False
+
+
+class _Trigger:
+    __slots__ = ("index", "entry", "compiled", "literal")
+
+    def __init__(self, index, entry, compiled, literal):
+        self.index = index
+        self.entry = entry
+        self.compiled = compiled
+        self.literal = literal
+
+
+class RegexMatcher:
+    """Matches text against regexes of all entries of config dict (responses or reactions).
+    Regexes are compiled once. Regexes that require some literal are looked up by first characters of the literal
+    in the set of text n-grams, so only regexes which literal is in the text are evaluated.
+    Other regexes are joined into single alternation that rejects non-matching text in one pass.
+    Entries which regexes contain known pathological constructs or take too much time to match are disabled"""
+
+    def __init__(self):
+        self._source = None
+        self._count = 0
+        self._triggers = []
+        # n-gram length -> n-gram -> indices of triggers whose literal starts with n-gram
+        self._ngrams = dict()
+        self._gate = None
+        self._gated = []
+        self._separate = []
+        # (index, entry, reason) of entries that were disabled
+        self._disabled = []
+        # index -> number of consecutive slow matches
+        self._slow_matches = dict()
+
+    def invalidate(self):
+        """Rebuild matcher on next use (should be called when entries are added, updated or removed)"""
+        self._source = None
+        self._slow_matches = dict()
+
+    def _build(self, entries):
+        self._triggers = []
+        self._ngrams = dict()
+        self._gated = []
+        self._separate = []
+        combined = []
+        for index, entry in entries.items():
+            if getattr(entry, "disabled", False):
+                continue
+            try:
+                parsed = sre_parse.parse(entry.regex)
+                compiled = re.compile(entry.regex)
+            except (re.error, RecursionError, OverflowError) as e:
+                log.warning(f"Skipping incorrect regex #{index} '{entry.regex}': {e}")
+                continue
+            # Entries could be added before regexes were checked by commands
+            problem = check_regex(entry.regex)
+            if problem is not None:
+                log.warning(f"Regex #{index} '{entry.regex}' is disabled: {problem}")
+                entry.disabled = True
+                self._disabled.append((index, entry, f"{problem} (`{entry.regex}`)"))
+                continue
+            literal = None if compiled.flags & re.IGNORECASE else required_literal(parsed) or None
+            position = len(self._triggers)
+            self._triggers.append(_Trigger(index, entry, compiled, literal))
+            if literal is not None:
+                ngram = literal[:NGRAM_LENGTH]
+                self._ngrams.setdefault(len(ngram), dict()).setdefault(ngram, []).append(position)
+            elif compiled.flags & ~re.UNICODE or compiled.groupindex or _has_group_references(parsed):
+                # Regexes with inline flags, named groups or backreferences can not be joined into alternation
+                self._separate.append(position)
+            else:
+                self._gated.append(position)
+                combined.append(f"(?:{entry.regex})")
+        self._gate = None
+        if combined:
+            try:
+                self._gate = re.compile('|'.join(combined))
+            except (re.error, RecursionError, OverflowError) as e:
+                log.warning(f"Failed to join regexes into single pattern: {e}")
+                self._separate = sorted(self._separate + self._gated)
+                self._gated = []
+        self._source = entries
+        self._count = len(entries)
+
+    def match(self, entries, text, max_match_time):
+        """Get list of entries which regexes match text (in order of entries).
+        Entries which regexes take more than max_match_time seconds SLOW_MATCHES_TO_DISABLE times in a row
+        are disabled (see pop_disabled())"""
+        if entries is not self._source or len(entries) != self._count:
+            self._build(entries)
+        candidates = list(self._separate)
+        if self._gate is not None:
+            start = time.perf_counter()
+            if self._gate.search(text) is not None:
+                candidates.extend(self._gated)
+            if time.perf_counter() - start > max_match_time:
+                # Evaluate joined regexes separately to find the slow one
+                log.warning(f"Joined regex took {time.perf_counter() - start:.3f}s, it is split")
+                candidates = sorted(set(candidates) | set(self._gated))
+                self._separate = sorted(self._separate + self._gated)
+                self._gated = []
+                self._gate = None
+        for length, ngrams in self._ngrams.items():
+            for ngram in ngrams.keys() & {text[i:i + length] for i in range(len(text) - length + 1)}:
+                candidates.extend(ngrams[ngram])
+        candidates.sort()
+        result = []
+        for position in candidates:
+            trigger = self._triggers[position]
+            if trigger.literal is not None and trigger.literal not in text:
+                continue
+            start = time.perf_counter()
+            matched = trigger.compiled.search(text)
+            elapsed = time.perf_counter() - start
+            if elapsed > max_match_time:
+                count = self._slow_matches[trigger.index] = self._slow_matches.get(trigger.index, 0) + 1
+                log.warning(f"Regex #{trigger.index} '{trigger.entry.regex}' took {elapsed:.3f}s "
+                            f"({count} slow matches in a row)")
+                if count >= SLOW_MATCHES_TO_DISABLE:
+                    log.warning(f"Regex #{trigger.index} '{trigger.entry.regex}' is disabled")
+                    del self._slow_matches[trigger.index]
+                    trigger.entry.disabled = True
+                    reason = (f"matching of its regex `{trigger.entry.regex}` took more than {max_match_time}s "
+                              f"{count} times in a row (last time: {elapsed:.3f}s)")
+                    self._disabled.append((trigger.index, trigger.entry, reason))
+                    self._source = None
+                    continue
+            else:
+                self._slow_matches.pop(trigger.index, None)
+            if matched:
+                result.append(trigger.entry)
+        return result
+
+    def pop_disabled(self):
+        """Get list of (index, entry, reason) of entries that were disabled since last call"""
+        result = self._disabled
+        self._disabled = []
+        return result
@@ -1,18 +1,148 @@
+import asyncio
+import collections
+import sys
+import time
+
+import discord
+
+
+class MessageSnapshot:
+    """Lightweight copy of discord.Message that is stored in MessageBuffer"""
+
+    __slots__ = ("id", "author_id", "content", "timestamp")
+
+    def __init__(self, id_, author_id, content, timestamp):
+        self.id = id_
+        self.author_id = author_id
+        self.content = content
+        self.timestamp = timestamp
+
+    @staticmethod
+    def from_message(message):
+        return MessageSnapshot(message.id, message.author.id, message.content, message.created_at)
+
+    def size(self):
+        return MessageBuffer.SNAPSHOT_OVERHEAD + sys.getsizeof(self.content)
+
+
+class _ChannelBuffer:
+    __slots__ = ("messages", "size", "last_used", "complete")
+
+    def __init__(self, capacity):
+        self.messages = collections.deque(maxlen=capacity)
+        self.size = 0
+        self.last_used = time.monotonic()
+        # True if the oldest message of channel is in the buffer
+        self.complete = False
+
+
 class MessageBuffer:
+    """Last messages of every channel (the newest message has index 0).
+    Every channel has fixed-size ring buffer. Buffers of channels that were idle for IDLE_CHANNEL_TIMEOUT seconds
+    are evicted. If total size of stored messages exceeds MAX_MEMORY, least recently used channels are evicted"""
+
     BUFFER_CAPACITY = 1001
+    IDLE_CHANNEL_TIMEOUT = 24 * 60 * 60
+    MAX_MEMORY = 64 * 1024 * 1024
+    # Approximate size of MessageSnapshot without content and its place in deque
+    SNAPSHOT_OVERHEAD = 160
 
     def __init__(self) -> None:
-        self._data = dict()
+        # Channels are ordered from least to most recently used
+        self._data = collections.OrderedDict()
+        self._size = 0
+        # channel id -> backfill task
+        self._backfills = dict()
+
+    def _get_buffer(self, channel_id):
+        buffer = self._data.get(channel_id)
+        if buffer is None:
+            buffer = self._data[channel_id] = _ChannelBuffer(self.BUFFER_CAPACITY)
+        else:
+            self._data.move_to_end(channel_id)
+        buffer.last_used = time.monotonic()
+        return buffer
 
     def push(self, message):
-        if message.channel.id not in self._data.keys():
-            self._data[message.channel.id] = []
-        self._data[message.channel.id].insert(0, message)
-        self._data[message.channel.id] = self._data[message.channel.id][:self.BUFFER_CAPACITY]
+        buffer = self._get_buffer(message.channel.id)
+        if len(buffer.messages) == buffer.messages.maxlen:
+            self._resize(buffer, -buffer.messages.pop().size())
+            buffer.complete = False
+        snapshot = MessageSnapshot.from_message(message)
+        buffer.messages.appendleft(snapshot)
+        self._resize(buffer, snapshot.size())
+        self._evict()
+
+    def _is_filled(self, channel_id, count):
+        buffer = self._data.get(channel_id)
+        return buffer is not None and (len(buffer.messages) >= count or buffer.complete)
+
+    async def backfill(self, channel, count):
+        """Make sure that count last messages of channel are in the buffer (or all messages if channel is shorter).
+        Only messages that are older than the oldest buffered one are fetched from channel history.
+        Concurrent backfills of the same channel share one history request"""
+        count = min(count, self.BUFFER_CAPACITY)
+        while not self._is_filled(channel.id, count):
+            task = self._backfills.get(channel.id)
+            if task is None:
+                task = self._backfills[channel.id] = asyncio.ensure_future(self._fetch_history(channel, count))
+                task.add_done_callback(lambda _: self._backfills.pop(channel.id, None))
+                if await asyncio.shield(task):
+                    # Fetched messages were discarded, history is fetched again
+                    continue
+                return
+            await asyncio.shield(task)
+
+    async def _fetch_history(self, channel, count):
+        """Returns False if fetched messages are added to the buffer and True if they are discarded"""
+        buffer = self._get_buffer(channel.id)
+        missing = count - len(buffer.messages)
+        before = discord.Object(id=buffer.messages[-1].id) if buffer.messages else None
+        messages = await channel.history(limit=missing, before=before).flatten()
+        if self._data.get(channel.id) is not buffer:
+            # Buffer was evicted while history was being fetched. New buffer may contain newer messages or be empty,
+            # so fetched messages are discarded (backfill() fetches history again)
+            return True
+        # Buffer could be updated while history was being fetched
+        buffer = self._get_buffer(channel.id)
+        known_ids = {snapshot.id for snapshot in buffer.messages}
+        for message in messages:
+            if len(buffer.messages) == buffer.messages.maxlen:
+                break
+            if message.id in known_ids or (buffer.messages and message.id > buffer.messages[-1].id):
+                continue
+            snapshot = MessageSnapshot.from_message(message)
+            buffer.messages.append(snapshot)
+            self._resize(buffer, snapshot.size())
+        if len(messages) < missing:
+            buffer.complete = True
+        self._evict()
+        return False
 
     def get(self, channel_id, index):
-        if channel_id not in self._data.keys():
+        buffer = self._data.get(channel_id)
+        if buffer is None:
             return
-        if not 0 <= index < len(self._data[channel_id]):
+        if not 0 <= index < len(buffer.messages):
             return
-        return self._data[channel_id][index]
+        return buffer.messages[index]
+
+    def _resize(self, buffer, delta):
+        buffer.size += delta
+        self._size += delta
+
+    def _evict(self):
+        idle_time = time.monotonic() - self.IDLE_CHANNEL_TIMEOUT
+        while len(self._data) > 1:
+            channel_id, buffer = next(iter(self._data.items()))
+            if buffer.last_used > idle_time and self._size <= self.MAX_MEMORY:
+                break
+            self._size -= buffer.size
+            del self._data[channel_id]
+
+    def __len__(self):
+        return sum(len(buffer.messages) for buffer in self._data.values())
+
+    def memory_usage(self):
+        """Approximate size of stored messages in bytes"""
+        return self._size
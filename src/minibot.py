@@ -1,13 +1,19 @@
+import os
+import sys
+import time
+
 import discord
 
-from src import const
-from src.config import GuildSettings, User
+from src import const, process
+from src.config import GuildSettings, SecretConfig, bc
 from src.log import log
+from src.patch.toplevel import FullLoadRequired, TopLevelConfig
+from src.utils import Util
 
 
 class MiniWalBot(discord.Client):
     def __init__(self, config, secret_config):
-        super().__init__()
+        super().__init__(**Util.get_discord_client_options(lean=True))
         self.config = config
         self.secret_config = secret_config
 
@@ -17,6 +23,10 @@ class MiniWalBot(discord.Client):
             if guild.id not in self.config.guilds.keys():
                 self.config.guilds[guild.id] = GuildSettings(guild.id)
 
+    def _get_permission_level(self, user_id):
+        user = self.config.users.get(user_id)
+        return user.permission_level if user is not None else const.Permission.USER.value
+
     async def on_message(self, message):
         try:
             log.info(str(message.author) + " -> " + message.content)
@@ -27,12 +37,72 @@ class MiniWalBot(discord.Client):
             if self.config.guilds[message.channel.guild.id].is_whitelisted:
                 if message.channel.id not in self.config.guilds[message.channel.guild.id].whitelist:
                     return
-            if message.author.id not in self.config.users.keys():
-                self.config.users[message.author.id] = User(message.author.id)
-            if self.config.users[message.author.id].permission_level < const.Permission.USER.value:
+            if self._get_permission_level(message.author.id) < const.Permission.USER.value:
                 return
             if not message.content.startswith(self.config.commands_prefix) and not self.user.mentioned_in(message):
                 return
             await message.channel.send("<Maintenance break>")
         except Exception:
             log.error("on_message failed", exc_info=True)
+
+
+class MiniConfig:
+    """Subset of config.yaml that mini-bot needs"""
+
+    __slots__ = ("guilds", "users", "commands_prefix")
+
+    def __init__(self, guilds=None, users=None, commands_prefix="!"):
+        self.guilds = guilds if guilds is not None else dict()
+        self.users = users if users is not None else dict()
+        self.commands_prefix = commands_prefix
+
+
+def read_mini_config(path):
+    """Read only fields that mini-bot needs. Commands, reminders, quotes, etc. are not parsed at all"""
+    if not os.path.isfile(path):
+        return MiniConfig()
+    try:
+        config = TopLevelConfig(path, legacy=False)
+        return MiniConfig(config.guilds, config.users, config.commands_prefix)
+    except FullLoadRequired:
+        config = Util.read_config_file(path)
+        return MiniConfig(config.guilds, config.users, config.commands_prefix)
+
+
+def start(args):
+    start_time = time.perf_counter()
+    # Check whether bot is already running
+    if process.is_running():
+        log.error("Bot is already running!")
+        return
+    bc.args = args
+    process.setup_nohup(args)
+    # Selecting YAML parser
+    bc.yaml_loader, bc.yaml_dumper = Util.get_yaml(verbose=True)
+    process.write_bot_cache()
+    process.run_patch_tool(args)
+    # Check config versions (only version headers are read)
+    ok = True
+    for path, name, expected in ((const.CONFIG_PATH, "Config", const.CONFIG_VERSION),
+                                 (const.SECRET_CONFIG_PATH, "Secret config", const.SECRET_CONFIG_VERSION)):
+        if os.path.isfile(path):
+            ok &= Util.check_version(name, Util.read_config_version(path), expected, solutions=["run patch tool"])
+    if not ok:
+        os.remove(const.BOT_CACHE_FILE_PATH)
+        sys.exit(1)
+    # Read configuration files
+    config = read_mini_config(const.CONFIG_PATH)
+    secret_config = Util.read_config_file(const.SECRET_CONFIG_PATH)
+    if secret_config is None:
+        secret_config = SecretConfig()
+    # Constructing bot instance
+    walbot = MiniWalBot(config, secret_config)
+    # Checking authentication token
+    if secret_config.token is None:
+        secret_config.token = input("Enter your token: ")
+    log.info(f"Mini-bot is initialized in {time.perf_counter() - start_time:.3f}s")
+    # Starting the bot
+    walbot.run(secret_config.token)
+    # After stopping the bot
+    log.info("Bot is disconnected!")
+    os.remove(const.BOT_CACHE_FILE_PATH)
@@ -0,0 +1,115 @@
+import os
+import re
+
+import yaml
+
+from src import const
+from src.serialization import get_legacy_loader
+from src.utils import Util
+
+# Anchors and aliases can link objects from different top-level fields
+ANCHOR_REGEX = re.compile(rb'[&*]id\d+')
+TOP_LEVEL_FIELD_REGEX = re.compile(rb'^([A-Za-z_][A-Za-z0-9_]*):( |\r?\n|$)')
+
+
+class FullLoadRequired(Exception):
+    """Raised when top-level field can not be processed without loading the whole config"""
+    pass
+
+
+class TopLevelConfig:
+    """Lightweight view of YAML config file that loads its top-level fields on demand.
+    Fields that are not accessed are copied to the output file as raw bytes without parsing."""
+
+    __slots__ = ("__dict__", "_path", "_legacy", "_preamble", "_blocks", "_deleted")
+
+    def __init__(self, path, legacy=True):
+        self._path = path
+        self._legacy = legacy
+        self._preamble = (0, 0)
+        self._blocks = dict()
+        self._deleted = set()
+        self._scan()
+
+    def _scan(self):
+        name = None
+        start = 0
+        offset = 0
+        with open(self._path, 'rb') as f:
+            for line in f:
+                if offset == 0 and const.CONFIG_VERSION_HEADER_REGEX.match(line.decode("utf-8").rstrip()):
+                    # Version header is regenerated on save
+                    start = len(line)
+                else:
+                    r = TOP_LEVEL_FIELD_REGEX.match(line)
+                    if r is not None:
+                        if name is None:
+                            self._preamble = (start, offset)
+                        else:
+                            self._blocks[name] = (start, offset)
+                        name = r.group(1).decode("utf-8")
+                        start = offset
+                offset += len(line)
+        if name is None:
+            raise FullLoadRequired(self._path)
+        self._blocks[name] = (start, offset)
+
+    def _read_block(self, name):
+        begin, end = self._blocks[name]
+        with open(self._path, 'rb') as f:
+            f.seek(begin)
+            return f.read(end - begin)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._blocks or name in self._deleted:
+            raise AttributeError(name)
+        block = self._read_block(name)
+        if ANCHOR_REGEX.search(block):
+            raise FullLoadRequired(name)
+        yaml_loader, _ = Util.get_yaml()
+        if self._legacy:
+            yaml_loader = get_legacy_loader(yaml_loader)
+        value = yaml.load(block, Loader=yaml_loader)[name]
+        self.__dict__[name] = value
+        return value
+
+    def __delattr__(self, name):
+        if name in self.__dict__:
+            del self.__dict__[name]
+        elif name not in self._blocks:
+            raise AttributeError(name)
+        self._deleted.add(name)
+
+    def save(self, path):
+        """Write config to path. Fields that were not loaded are copied from source file as is"""
+        _, yaml_dumper = Util.get_yaml()
+        names = (set(self._blocks.keys()) - self._deleted) | set(self.__dict__.keys())
+        with open(self._path, 'rb') as src, open(path, 'wb') as dst:
+            dst.write((const.CONFIG_VERSION_HEADER + str(self.version) + '\n').encode("utf-8"))
+            self._copy_range(src, dst, *self._preamble)
+            for name in sorted(names):
+                if name in self.__dict__:
+                    dst.write(yaml.dump(
+                        {name: self.__dict__[name]}, Dumper=yaml_dumper, encoding='utf-8', allow_unicode=True))
+                else:
+                    self._copy_range(src, dst, *self._blocks[name])
+
+    @staticmethod
+    def _copy_range(src, dst, begin, end, chunk_size=1024 * 1024):
+        src.seek(begin)
+        remaining = end - begin
+        while remaining > 0:
+            chunk = src.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            dst.write(chunk)
+            remaining -= len(chunk)
+
+
+def replace_with_backup(path, new_path, backup_path):
+    """Move current file to backup and put new file in its place (no copying involved)"""
+    backup_dir = os.path.dirname(backup_path)
+    if backup_dir and not os.path.exists(backup_dir):
+        os.makedirs(backup_dir)
+    os.replace(path, backup_path)
+    os.replace(new_path, path)
@@ -1,5 +1,6 @@
 import os
 
+from src import const
 from src.log import log
 
 
@@ -10,6 +11,16 @@ class Updater:
         self.modified = False
         getattr(self, os.path.splitext(path)[0])(config)
 
+    @staticmethod
+    def is_up_to_date(path, version):
+        """Check config version without dispatching it to updater"""
+        latest_versions = {
+            "config": const.CONFIG_VERSION,
+            "markov": const.MARKOV_CONFIG_VERSION,
+            "secret": const.SECRET_CONFIG_VERSION,
+        }
+        return latest_versions.get(os.path.splitext(os.path.basename(path))[0]) == version
+
     def result(self):
         return self.modified
 
@@ -123,6 +134,109 @@ class Updater:
                 config.ids["quote"] += 1
             self._bump_version(config, "0.0.18")
         if config.version == "0.0.18":
+            config.saving["changelog"] = {
+                "enabled": True,
+                "period": 5,
+            }
+            self._bump_version(config, "0.0.19")
+        if config.version == "0.0.19":
+            # Users with default permission level are not stored anymore
+            config.users = {id_: user for id_, user in config.users.items() if user.permission_level != 0}
+            self._bump_version(config, "0.0.20")
+        if config.version == "0.0.20":
+            config.__dict__["execution_budget"] = {
+                0: {
+                    "max_expansions": 50,
+                    "max_depth": 8,
+                    "max_length": 20000,
+                    "time_slice": 5.0,
+                },
+                1: {
+                    "max_expansions": 200,
+                    "max_depth": 16,
+                    "max_length": 100000,
+                    "time_slice": 15.0,
+                },
+                2: {
+                    "max_expansions": 1000,
+                    "max_depth": 32,
+                    "max_length": 1000000,
+                    "time_slice": 60.0,
+                },
+            }
+            self._bump_version(config, "0.0.21")
+        if config.version == "0.0.21":
+            config.__dict__["rate_limit"] = {
+                "enabled": True,
+                "reply": True,
+                "user": {
+                    "capacity": 5,
+                    "rate": 0.5,
+                },
+                "channel": {
+                    "capacity": 15,
+                    "rate": 1.0,
+                },
+                "guild": {
+                    "capacity": 30,
+                    "rate": 2.0,
+                },
+                "default_cost": 1,
+                "costs": {
+                    "curl": 3,
+                    "markov": 2,
+                    "range": 2,
+                },
+            }
+            self._bump_version(config, "0.0.22")
+        if config.version == "0.0.22":
+            config.__dict__["external_commands"] = {
+                "timeout": 60,
+                "max_concurrent": 4,
+                "max_output": 100000,
+            }
+            self._bump_version(config, "0.0.23")
+        if config.version == "0.0.23":
+            for command in config.commands.data.values():
+                command.cache_ttl = 0
+            self._bump_version(config, "0.0.24")
+        if config.version == "0.0.24":
+            config.__dict__["http_client"] = {
+                "timeout": 30,
+                "connect_timeout": 10,
+                "max_connections": 32,
+                "max_connections_per_host": 4,
+                "max_body_size": 8 * 1024 * 1024,
+                "cache": {
+                    "enabled": True,
+                    "max_entries": 256,
+                    "max_size": 64 * 1024 * 1024,
+                },
+            }
+            self._bump_version(config, "0.0.25")
+        if config.version == "0.0.25":
+            config.__dict__["image_variants"] = {
+                "enabled": True,
+                "max_dimension": 1024,
+                "jpeg_quality": 85,
+            }
+            self._bump_version(config, "0.0.26")
+        if config.version == "0.0.26":
+            config.__dict__["regex_safety"] = {
+                "max_match_time": 0.1,
+                "search_timeout": 10.0,
+            }
+            for reaction in config.reactions.values():
+                reaction.__dict__["disabled"] = False
+            for response in config.responses.values():
+                response.__dict__["disabled"] = False
+            self._bump_version(config, "0.0.27")
+        if config.version == "0.0.27":
+            config.__dict__["discord_client"] = {
+                "lean": True,
+            }
+            self._bump_version(config, "0.0.28")
+        if config.version == "0.0.28":
             log.info(f"Version of {self.config_path} is up to date!")
         else:
             log.error(f"Unknown version {config.version} for {self.config_path}!")
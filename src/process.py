@@ -0,0 +1,81 @@
+"""
+Helpers for managing bot process (pid cache file, output redirection, patching before start)
+These helpers do not import heavy dependencies, so they are shared by main bot and mini-bot
+"""
+
+import argparse
+import importlib
+import os
+import signal
+import sys
+import time
+
+import psutil
+
+from src import const
+from src.log import log
+
+
+def parse_bot_cache():
+    pid = None
+    if os.path.exists(const.BOT_CACHE_FILE_PATH):
+        cache = None
+        with open(const.BOT_CACHE_FILE_PATH, 'r') as f:
+            cache = f.read()
+        if cache is not None:
+            try:
+                pid = int(cache)
+            except ValueError:
+                log.warning("Could not read pid from .bot_cache")
+                os.remove(const.BOT_CACHE_FILE_PATH)
+    return pid
+
+
+def is_running():
+    pid = parse_bot_cache()
+    return pid is not None and psutil.pid_exists(pid)
+
+
+def write_bot_cache():
+    # Saving application pd in order to safely stop it later
+    with open(const.BOT_CACHE_FILE_PATH, 'w') as f:
+        f.write(str(os.getpid()))
+
+
+def setup_nohup(args):
+    # Handle --nohup flag
+    if sys.platform in ("linux", "darwin") and args.nohup:
+        fd = os.open(const.NOHUP_FILE_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+        log.info(f"Output is redirected to {const.NOHUP_FILE_PATH}")
+        os.dup2(fd, sys.stdout.fileno())
+        os.dup2(sys.stdout.fileno(), sys.stderr.fileno())
+        os.close(fd)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+
+def run_patch_tool(args):
+    # Executing patch tool if it is necessary
+    if args.patch:
+        log.info("Executing patch tool")
+        config_files = [path for path in (const.CONFIG_PATH, const.MARKOV_PATH, const.SECRET_CONFIG_PATH)
+                        if os.path.isfile(path)]
+        importlib.import_module("tools.patch").main(argparse.Namespace(file="all"), config_files)
+
+
+def stop(_):
+    if not os.path.exists(const.BOT_CACHE_FILE_PATH):
+        log.error("Could not stop the bot (cache file does not exist)")
+        return
+    pid = parse_bot_cache()
+    if pid is None:
+        log.error("Could not stop the bot (cache file does not contain pid)")
+        return
+    if psutil.pid_exists(pid):
+        os.kill(pid, signal.SIGINT)
+        while psutil.pid_exists(pid):
+            log.debug("Bot is still running. Please, wait...")
+            time.sleep(0.5)
+        log.info("Bot is stopped!")
+    else:
+        log.error("Could not stop the bot (bot is not running)")
+        os.remove(const.BOT_CACHE_FILE_PATH)
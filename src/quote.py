@@ -1,7 +1,12 @@
 import datetime
 
+from src.serialization import yaml_object
 
+
+@yaml_object
 class Quote:
+    __slots__ = ("message", "author", "added_by", "timestamp")
+
     def __init__(self, message, added_by):
         self.message = message
         self.author = ""
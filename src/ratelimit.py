@@ -0,0 +1,76 @@
+import time
+
+from src import const
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "warned")
+
+    def __init__(self, capacity, now):
+        self.tokens = capacity
+        self.updated = now
+        self.warned = False
+
+    def refill(self, capacity, rate, now):
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """Token bucket rate limiter for command invocations. Every invocation takes tokens (command cost) from buckets
+    of user, channel and guild. Invocation is throttled if any of these buckets does not have enough tokens"""
+
+    SCOPES = ("user", "channel", "guild")
+    # Buckets that are full are dropped when number of buckets reaches this value
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self):
+        self._buckets = {scope: dict() for scope in self.SCOPES}
+        self._prune_at = {scope: self.PRUNE_THRESHOLD for scope in self.SCOPES}
+        self.throttled = {scope: 0 for scope in self.SCOPES}
+
+    def acquire(self, settings, command_name, user, channel_id, guild_id):
+        """Try to take tokens for command invocation.
+        Returns None if invocation is allowed, otherwise (scope that is exhausted, whether user should be warned)"""
+        if not settings["enabled"]:
+            return None
+        if user is not None and user.permission_level >= const.Permission.MOD.value:
+            return None
+        cost = settings["costs"].get(command_name, settings["default_cost"])
+        now = time.monotonic()
+        buckets = []
+        for scope, id_ in zip(self.SCOPES, (user.id if user is not None else None, channel_id, guild_id)):
+            if id_ is None:
+                continue
+            capacity = settings[scope]["capacity"]
+            bucket = self._buckets[scope].get(id_)
+            if bucket is None:
+                if len(self._buckets[scope]) >= self._prune_at[scope]:
+                    self._prune(scope, settings[scope], now)
+                bucket = self._buckets[scope][id_] = TokenBucket(capacity, now)
+            else:
+                bucket.refill(capacity, settings[scope]["rate"], now)
+            if bucket.tokens < cost:
+                self.throttled[scope] += 1
+                warn = not bucket.warned
+                bucket.warned = True
+                return scope, warn
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.tokens -= cost
+            bucket.warned = False
+        return None
+
+    def _prune(self, scope, settings, now):
+        buckets = self._buckets[scope]
+        for id_ in [id_ for id_, bucket in buckets.items()
+                    if bucket.tokens + (now - bucket.updated) * settings["rate"] >= settings["capacity"]]:
+            del buckets[id_]
+        # Do not scan all buckets again until their number grows significantly
+        self._prune_at[scope] = max(self.PRUNE_THRESHOLD, 2 * len(buckets))
+
+    def reset_counters(self):
+        self.throttled = {scope: 0 for scope in self.SCOPES}
+
+    def report(self):
+        return "Throttled invocations: " + ", ".join(f"{scope}: {count}" for scope, count in self.throttled.items())
@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import re
+import sre_constants
+import sre_parse
+
+_UNBOUNDED_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+class RegexTimeout(Exception):
+    """Raised when regex evaluation exceeds time limit"""
+    pass
+
+
+def _subpatterns(av):
+    for item in (av if isinstance(av, (tuple, list)) else (av,)):
+        if isinstance(item, sre_parse.SubPattern):
+            yield item
+        elif isinstance(item, list):
+            yield from (x for x in item if isinstance(x, sre_parse.SubPattern))
+
+
+def _literal_string(parsed):
+    """Returns string if parsed regex matches only this string, otherwise None"""
+    result = ""
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            result += chr(av)
+        elif op == sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            inner = _literal_string(av[-1])
+            if inner is None:
+                return None
+            result += inner
+        else:
+            return None
+    return result
+
+
+def _find_pathological(parsed, in_repeat=False):
+    """Find constructs that may cause catastrophic backtracking. Returns description or None"""
+    for op, av in parsed:
+        if op in _UNBOUNDED_REPEATS and av[1] == sre_constants.MAXREPEAT:
+            if in_repeat:
+                return "nested quantifiers"
+            problem = _find_pathological(av[2], True)
+            if problem is not None:
+                return problem
+            continue
+        if op == sre_constants.BRANCH and in_repeat:
+            branches = [_literal_string(branch) for branch in av[1]]
+            branches = [branch for branch in branches if branch is not None]
+            for i, a in enumerate(branches):
+                if any(i != j and b.startswith(a) for j, b in enumerate(branches)):
+                    return "overlapping alternatives inside quantifier"
+        for subpattern in _subpatterns(av):
+            problem = _find_pathological(subpattern, in_repeat)
+            if problem is not None:
+                return problem
+    return None
+
+
+def check_regex(regex):
+    """Check that regex is correct and does not contain known pathological constructs
+    (nested quantifiers like (a+)+, overlapping alternatives inside quantifier like (a|ab)*).
+    Returns error message or None if regex is safe"""
+    try:
+        parsed = sre_parse.parse(regex)
+        re.compile(regex)
+    except (re.error, RecursionError, OverflowError) as e:
+        return f"Invalid regular expression: {e}"
+    problem = _find_pathological(parsed)
+    if problem is not None:
+        return f"Regular expression is rejected because it may be too slow: {problem}"
+    return None
+
+
+def _search_worker(regex, words, connection):
+    try:
+        compiled = re.compile(regex)
+        connection.send([word for word in words if compiled.search(word)])
+    except Exception as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+def _search(regex, words, timeout):
+    # Forked worker inherits words without serialization
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_search_worker, args=(regex, words, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise RegexTimeout(f"Regular expression evaluation took more than {timeout}s")
+        result = receiver.recv()
+    except EOFError:
+        raise RegexTimeout("Regular expression evaluation was interrupted")
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+async def search_words(regex, words, timeout):
+    """Get list of words that match regex. Evaluation is performed in worker process that is killed
+    if it exceeds timeout (RegexTimeout is raised)"""
+    return await asyncio.get_event_loop().run_in_executor(None, _search, regex, list(words), timeout)
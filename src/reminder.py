@@ -1,4 +1,17 @@
+import asyncio
+import datetime
+import heapq
+import time
+
+from src import const
+from src.log import log
+from src.serialization import yaml_object
+
+
+@yaml_object
 class Reminder:
+    __slots__ = ("time", "message", "channel_id", "ping_users", "whisper_users", "repeat_after")
+
     def __init__(self, time, message, channel_id):
         self.time = time
         self.message = message
@@ -15,3 +28,96 @@ class Reminder:
 
     def __gt__(self, time):
         return self.time > time
+
+    def get_timestamp(self):
+        """Get Unix timestamp of reminder time (reminder time is in local time zone)"""
+        return time.mktime(datetime.datetime.strptime(self.time, const.REMINDER_TIME_FORMAT).timetuple())
+
+    def get_next_time(self, now):
+        """Get first time of recurring reminder after now (datetime) as string"""
+        period = datetime.timedelta(minutes=self.repeat_after)
+        start = datetime.datetime.strptime(self.time, const.REMINDER_TIME_FORMAT)
+        count = max(1, (now - start) // period + 1)
+        return (start + count * period).strftime(const.REMINDER_TIME_FORMAT)
+
+
+class ReminderScheduler:
+    """Min-heap of reminder ids keyed on due time (Unix timestamp).
+    Entries of updated or deleted reminders are not removed from heap, they are skipped when they reach the top"""
+
+    def __init__(self):
+        self._heap = []
+        # reminder id -> timestamp of its actual heap entry
+        self._due_times = dict()
+        self._changed = None
+
+    def rebuild(self, reminders):
+        """Schedule all reminders from scratch"""
+        self._due_times = dict()
+        for key, reminder in reminders.items():
+            try:
+                self._due_times[key] = reminder.get_timestamp()
+            except (ValueError, OverflowError) as e:
+                log.warning(f"Reminder {key} has incorrect time '{reminder.time}': {e}")
+        self._heap = [(timestamp, key) for key, timestamp in self._due_times.items()]
+        heapq.heapify(self._heap)
+        self._notify()
+
+    def schedule(self, key, reminder):
+        """Add reminder or update time of already scheduled one"""
+        try:
+            timestamp = reminder.get_timestamp()
+        except (ValueError, OverflowError) as e:
+            log.warning(f"Reminder {key} has incorrect time '{reminder.time}': {e}")
+            self.cancel(key)
+            return
+        self._due_times[key] = timestamp
+        heapq.heappush(self._heap, (timestamp, key))
+        if len(self._heap) > 2 * len(self._due_times) + 64:
+            # Drop stale entries
+            self._heap = [(timestamp, key) for key, timestamp in self._due_times.items()]
+            heapq.heapify(self._heap)
+        self._notify()
+
+    def cancel(self, key):
+        """Remove reminder from schedule"""
+        self._due_times.pop(key, None)
+
+    def _peek(self):
+        while self._heap and self._due_times.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    def next_due_time(self):
+        """Get timestamp of the earliest scheduled reminder or None if there are no reminders"""
+        top = self._peek()
+        return top[0] if top is not None else None
+
+    def pop_due(self, now):
+        """Remove reminders which due time is not later than now from schedule.
+        Returns list of (reminder id, due time) in order of due time"""
+        result = []
+        top = self._peek()
+        while top is not None and top[0] <= now:
+            heapq.heappop(self._heap)
+            del self._due_times[top[1]]
+            result.append((top[1], top[0]))
+            top = self._peek()
+        return result
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    async def wait(self, timeout):
+        """Sleep for timeout seconds or until schedule is changed"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._changed.clear()
+
+    def __len__(self):
+        return len(self._due_times)
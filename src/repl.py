@@ -29,6 +29,17 @@ class REPLCommands:
             result += f"{guild[0]} -> {guild[1]}\n"
         return result
 
+    @staticmethod
+    def stats(message):
+        if len(message) == 2 and message[1] == "reset":
+            bc.stats.reset()
+            bc.rate_limiter.reset_counters()
+            bc.external_commands.reset_counters()
+            bc.http.reset_counters()
+            return "Statistics is reset"
+        return ((bc.stats.report(message[1:] or None) or "No commands were executed yet\n") +
+                bc.rate_limiter.report() + '\n' + bc.external_commands.report() + '\n' + bc.http.report())
+
 
 class Repl:
     def __init__(self, port) -> None:
@@ -0,0 +1,70 @@
+import yaml
+
+PYTHON_OBJECT_TAG = "tag:yaml.org,2002:python/object:"
+
+_loaders = [loader for loader in (getattr(yaml, "Loader", None), getattr(yaml, "CLoader", None)) if loader]
+_dumpers = [dumper for dumper in (getattr(yaml, "Dumper", None), getattr(yaml, "CDumper", None)) if dumper]
+# Legacy loaders get their own copy of constructors, so constructors of __slots__ entities are not inherited
+_legacy_loaders = {
+    loader: type("Legacy" + loader.__name__, (loader,), {"yaml_constructors": dict(loader.yaml_constructors)})
+    for loader in _loaders
+}
+_legacy_classes = dict()
+
+
+class LegacyObject:
+    """Plain object that patch tool uses instead of __slots__ entities.
+    Outdated configs may contain fields that are not present in current __slots__ layout"""
+
+    yaml_tag = None
+
+
+def _represent_legacy_object(dumper, data):
+    return dumper.represent_mapping(type(data).yaml_tag, data.__dict__)
+
+
+def _construct_legacy_object(loader, suffix, node):
+    cls = loader.find_python_name(suffix, node.start_mark)
+    if not hasattr(cls, "__slots__"):
+        yield from loader.construct_python_object(suffix, node)
+        return
+    if node.tag not in _legacy_classes:
+        _legacy_classes[node.tag] = type("Legacy" + cls.__name__, (LegacyObject,), {"yaml_tag": node.tag})
+    instance = _legacy_classes[node.tag]()
+    yield instance
+    instance.__dict__.update(loader.construct_mapping(node, deep=True))
+
+
+for _dumper in _dumpers:
+    yaml.add_multi_representer(LegacyObject, _represent_legacy_object, Dumper=_dumper)
+for _legacy_loader in _legacy_loaders.values():
+    yaml.add_multi_constructor(PYTHON_OBJECT_TAG, _construct_legacy_object, Loader=_legacy_loader)
+
+
+def yaml_object(cls):
+    """Class decorator that registers YAML representer and constructor for class with __slots__.
+    Fields are stored in the same format as PyYAML uses for plain Python objects, so config files stay compatible.
+    Slots that start with underscore are treated as runtime state and are not saved"""
+    tag = PYTHON_OBJECT_TAG + cls.__module__ + '.' + cls.__name__
+    fields = tuple(name for name in cls.__slots__ if not name.startswith('_'))
+
+    def represent(dumper, data):
+        return dumper.represent_mapping(
+            tag, {name: getattr(data, name) for name in fields if hasattr(data, name)})
+
+    def construct(loader, node):
+        instance = cls.__new__(cls)
+        yield instance
+        for key, value in loader.construct_mapping(node, deep=True).items():
+            setattr(instance, key, value)
+
+    for dumper in _dumpers:
+        yaml.add_representer(cls, represent, Dumper=dumper)
+    for loader in _loaders:
+        yaml.add_constructor(tag, construct, Loader=loader)
+    return cls
+
+
+def get_legacy_loader(loader):
+    """Get loader that constructs LegacyObject instead of __slots__ entities (used by patch tool)"""
+    return _legacy_loaders[loader]
@@ -0,0 +1,122 @@
+import bisect
+import threading
+
+# Upper bounds of latency histogram buckets (in seconds). The last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30)
+
+
+class Histogram:
+    """Histogram with fixed buckets. Memory usage does not depend on number of samples"""
+
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, p):
+        """Upper bound of bucket that contains p-th percentile"""
+        count = self.count
+        if count == 0:
+            return 0.0
+        rank = p / 100 * count
+        accumulated = 0
+        for i, bucket_count in enumerate(self.counts):
+            accumulated += bucket_count
+            if accumulated >= rank:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+
+class CommandStats:
+    """Execution statistics of single command"""
+
+    __slots__ = ("latency", "errors", "aborted", "throttled", "response_bytes", "max_response_bytes", "expansion")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.aborted = 0
+        self.throttled = 0
+        self.response_bytes = 0
+        self.max_response_bytes = 0
+        # Time spent on subcommand expansion during command execution
+        self.expansion = Histogram()
+
+
+class Stats:
+    """In-memory statistics of command execution (not saved to config)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = dict()
+
+    def _get(self, name):
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        return stats
+
+    def record_call(self, name, elapsed, result=None, error=False, aborted=False):
+        with self._lock:
+            stats = self._get(name)
+            stats.latency.add(elapsed)
+            if error:
+                stats.errors += 1
+            if aborted:
+                stats.aborted += 1
+            if isinstance(result, str):
+                stats.response_bytes += len(result)
+                stats.max_response_bytes = max(stats.max_response_bytes, len(result))
+
+    def record_throttled(self, name):
+        with self._lock:
+            self._get(name).throttled += 1
+
+    def record_expansion(self, name, elapsed):
+        with self._lock:
+            self._get(name).expansion.add(elapsed)
+
+    def reset(self):
+        with self._lock:
+            self.commands = dict()
+
+    def report(self, names=None, limit=10):
+        """Get text report for commands (by default: commands with highest total execution time)"""
+        with self._lock:
+            if names is None:
+                names = sorted(self.commands.keys(), key=lambda x: self.commands[x].latency.total, reverse=True)
+                names = names[:limit]
+            result = ""
+            for name in names:
+                stats = self.commands.get(name)
+                if stats is None:
+                    result += f"{name}: no calls\n"
+                    continue
+                calls = stats.latency.count
+                if calls == 0:
+                    result += f"{name}: no calls, throttled: {stats.throttled}\n"
+                    continue
+                result += (f"{name}: calls: {calls}, errors: {stats.errors}, aborted: {stats.aborted}, "
+                           f"throttled: {stats.throttled}, "
+                           f"avg: {stats.latency.total / calls * 1000:.1f}ms, "
+                           f"p50: <={stats.latency.percentile(50) * 1000:.0f}ms, "
+                           f"p95: <={stats.latency.percentile(95) * 1000:.0f}ms, "
+                           f"max: {stats.latency.max * 1000:.1f}ms, "
+                           f"avg response: {stats.response_bytes // calls} chars")
+                if stats.expansion.count:
+                    result += (f", subcommand expansion: {stats.expansion.count} times, "
+                               f"avg: {stats.expansion.total / stats.expansion.count * 1000:.1f}ms")
+                result += '\n'
+            return result
@@ -0,0 +1,32 @@
+from src.algorithms import encode_words, levenshtein_distance_batch
+
+
+class SuggestionIndex:
+    """Index of words for "did you mean" suggestions.
+    Words are bucketed by length: difference of lengths is a lower bound of Levenshtein distance,
+    so buckets that can not contain better candidates are not scanned at all"""
+
+    def __init__(self, *word_sets):
+        self.word_sets = tuple(set(words) for words in word_sets)
+        buckets = dict()
+        for words in self.word_sets:
+            for word in words:
+                buckets.setdefault(len(word), []).append(word)
+        self._buckets = {length: (words, encode_words(words)) for length, words in buckets.items()}
+
+    def is_built_for(self, *word_sets):
+        """Check if index contains exactly these words (sets or dict key views)"""
+        return len(word_sets) == len(self.word_sets) and all(a == b for a, b in zip(self.word_sets, word_sets))
+
+    def suggest(self, word, count=1):
+        """Get up to count words that are closest to word (ranked by distance, then alphabetically)"""
+        scored = []
+        for length in sorted(self._buckets.keys(), key=lambda x: abs(x - len(word))):
+            max_distance = scored[count - 1][0] if len(scored) >= count else -1
+            if max_distance >= 0 and abs(length - len(word)) > max_distance:
+                break
+            words, encoded_words = self._buckets[length]
+            distances = levenshtein_distance_batch(word, encoded_words, max_distance)
+            scored.extend(zip(map(int, distances), words))
+            scored.sort()
+        return [candidate for _, candidate in scored[:count]]
@@ -0,0 +1,133 @@
+import re
+
+from src import const
+
+
+class Template:
+    """Custom command message (or command line) that is parsed once and rendered in a single pass"""
+
+    __slots__ = ("source", "tokens", "has_args")
+
+    AUTHOR = 0
+    ALL_ARGS = 1
+    ARGS_RANGE = 2
+    ARG = 3
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = []
+        self.has_args = False
+        pos = 0
+        for r in const.TEMPLATE_VARIABLE_REGEX.finditer(source):
+            if r.start() > pos:
+                self.tokens.append(source[pos:r.start()])
+            text = r.group(0)
+            if text == "@author@":
+                self.tokens.append((self.AUTHOR, text))
+            elif text == "@args@":
+                self.tokens.append((self.ALL_ARGS, text))
+            elif r.group(3) is not None:
+                self.tokens.append((self.ARG, text, int(r.group(3))))
+            else:
+                n1 = int(r.group(1)) if r.group(1) else None
+                n2 = int(r.group(2)) + 1 if r.group(2) else None
+                self.tokens.append((self.ARGS_RANGE, text, n1, n2))
+            self.has_args = self.has_args or text != "@author@"
+            pos = r.end()
+        if pos < len(source):
+            self.tokens.append(source[pos:])
+
+    @staticmethod
+    def _is_safe(string):
+        return const.ALNUM_STRING_REGEX.match(string) is not None
+
+    def render(self, author, command, safe=False):
+        """Substitute variables. If safe is True, only alphanumeric arguments are substituted"""
+        if not self.has_args:
+            return ''.join(token if isinstance(token, str) else author for token in self.tokens)
+        all_args = ' '.join(command[1:])
+        args_allowed = not safe or self._is_safe(all_args)
+        result = []
+        for token in self.tokens:
+            if isinstance(token, str):
+                result.append(token)
+            elif token[0] == self.AUTHOR:
+                result.append(author)
+            elif token[0] == self.ALL_ARGS:
+                result.append(all_args if args_allowed else token[1])
+            elif token[0] == self.ARG:
+                i = token[2]
+                if i < len(command) and (not safe or self._is_safe(command[i])):
+                    result.append(command[i])
+                else:
+                    result.append(token[1])
+            else:
+                n1 = token[2] if token[2] is not None else 1
+                n2 = token[3] if token[3] is not None else len(command)
+                if not args_allowed or not 0 < n1 < len(command) or not 0 < n2 <= len(command) or n1 > n2:
+                    result.append(token[1])
+                    continue
+                args = ' '.join(command[n1:n2])
+                result.append(args if not safe or self._is_safe(args) else token[1])
+        return ''.join(result)
+
+
+SUBCOMMAND_BRACKETS = {
+    '(': ')',
+    '[': ']',
+    '`': '`',
+    '{': '}',
+}
+_OPENING_BRACKETS = {closing: opening for opening, closing in SUBCOMMAND_BRACKETS.items()}
+# Characters that can start or end subcommand
+_SUBCOMMAND_SPECIAL_REGEX = re.compile(r'[$)\]`}]')
+
+
+async def expand_subcommands(content, execute):
+    """Expand $(...), $[...], $`...` and ${...} subcommands in a single pass over content.
+    Subcommands are executed bottom-up and left to right: innermost subcommand is executed when its closing bracket
+    is found, and its result becomes a part of enclosing subcommand.
+    execute is a coroutine function that takes subcommand text and returns its result"""
+    # Frame is [opening bracket, parts]. Bottom frame holds top-level content
+    stack = [[None, []]]
+    # Stack indices of unclosed frames for every bracket type
+    open_frames = {bracket: [] for bracket in SUBCOMMAND_BRACKETS.keys()}
+    start = 0
+    i = 0
+    n = len(content)
+    while True:
+        r = _SUBCOMMAND_SPECIAL_REGEX.search(content, i)
+        if r is None:
+            break
+        i = r.start()
+        c = content[i]
+        if c in _OPENING_BRACKETS and open_frames[_OPENING_BRACKETS[c]]:
+            stack[-1][1].append(content[start:i])
+            frame_index = open_frames[_OPENING_BRACKETS[c]].pop()
+            # Unclosed subcommands inside closed one are treated as plain text
+            while len(stack) - 1 > frame_index:
+                _collapse_frame(stack, open_frames)
+            _, parts = stack.pop()
+            stack[-1][1].append(await execute(''.join(parts)))
+            i += 1
+            start = i
+        elif (c == '$' and i + 1 < n and content[i + 1] in SUBCOMMAND_BRACKETS.keys() and
+              not (content[i + 1] in _OPENING_BRACKETS and open_frames[_OPENING_BRACKETS[content[i + 1]]])):
+            stack[-1][1].append(content[start:i])
+            open_frames[content[i + 1]].append(len(stack))
+            stack.append([content[i + 1], []])
+            i += 2
+            start = i
+        else:
+            i += 1
+    stack[-1][1].append(content[start:])
+    while len(stack) > 1:
+        _collapse_frame(stack, open_frames)
+    return ''.join(stack[0][1])
+
+
+def _collapse_frame(stack, open_frames):
+    bracket, parts = stack.pop()
+    if open_frames[bracket] and open_frames[bracket][-1] == len(stack):
+        open_frames[bracket].pop()
+    stack[-1][1].append('$' + bracket + ''.join(parts))
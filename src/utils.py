@@ -1,10 +1,12 @@
 import os
-import subprocess
 
+import discord
 import yaml
 
+from src import const
 from src.log import log
 from src.message import Msg
+from src.serialization import get_legacy_loader
 
 
 class Util:
@@ -46,22 +48,10 @@ class Util:
         return True
 
     @staticmethod
-    async def run_external_command(message, cmd_line, silent=False):
-        result = ""
-        try:
-            log.debug(f"Processing external command: '{cmd_line}'")
-            process = subprocess.run(cmd_line, shell=True, check=True,
-                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            log.debug(f"External command '{cmd_line}' finished execution with return code: {process.returncode}")
-            result = process.stdout.decode("utf-8")
-            await Msg.response(message, result, silent)
-        except subprocess.CalledProcessError as e:
-            await Msg.response(message, f"<Command failed with error code {e.returncode}>", silent)
-        return result
-
-    @staticmethod
-    def read_config_file(path):
+    def read_config_file(path, legacy=False):
         yaml_loader, _ = Util.get_yaml()
+        if legacy:
+            yaml_loader = get_legacy_loader(yaml_loader)
         if os.path.isfile(path):
             with open(path, 'r') as f:
                 try:
@@ -70,6 +60,28 @@ class Util:
                     log.error(f"File '{path}' can not be read!", exc_info=True)
         return None
 
+    @staticmethod
+    def read_config_version(path):
+        """Get version of config file without parsing its body"""
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            r = const.CONFIG_VERSION_HEADER_REGEX.match(f.readline().decode("utf-8").rstrip())
+            if r is not None:
+                return r.group(1)
+            # Fallback for files that were saved without version header
+            f.seek(0)
+            for line in f:
+                if line.startswith(b"version:"):
+                    return str(yaml.safe_load(line)["version"])
+        return None
+
+    @staticmethod
+    def dump_config(config, dumper):
+        """Serialize config to YAML with version header on the first line"""
+        header = (const.CONFIG_VERSION_HEADER + str(config.version) + '\n').encode("utf-8")
+        return header + yaml.dump(config, Dumper=dumper, encoding='utf-8', allow_unicode=True)
+
     @staticmethod
     def get_yaml(verbose=False):
         try:
@@ -89,3 +101,17 @@ class Util:
             if verbose:
                 log.debug("Using slow YAML Dumper")
         return loader, dumper
+
+    @staticmethod
+    def get_discord_client_options(lean):
+        """Get keyword arguments for discord.Client. Lean client does not keep its own cache of messages
+        (MessageBuffer is used instead) and subscribes only to guild and guild message events"""
+        if not lean:
+            return {}
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        return {
+            "max_messages": None,
+            "intents": intents,
+        }
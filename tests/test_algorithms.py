@@ -0,0 +1,94 @@
+import random
+import string
+import unittest
+
+from src.algorithms import PythonAlgorithms
+
+try:
+    from src import algorithms_numba
+except ImportError:
+    algorithms_numba = None
+
+
+def _reference_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        cur = [i]
+        for j, y in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (x != y)))
+        prev = cur
+    return prev[-1]
+
+
+def _clamp(distance, max_distance):
+    return min(distance, max_distance + 1) if max_distance >= 0 else distance
+
+
+def _random_pairs(rng, count, min_length, max_length, alphabet="abcd"):
+    for _ in range(count):
+        a = ''.join(rng.choice(alphabet) for _ in range(rng.randint(min_length, max_length)))
+        # Similar strings are more likely to be under the cutoff
+        b = list(a)
+        for _ in range(rng.randint(0, 10)):
+            position = rng.randint(0, len(b))
+            operation = rng.randint(0, 2)
+            if operation == 0:
+                b.insert(position, rng.choice(alphabet))
+            elif b and position < len(b):
+                if operation == 1:
+                    del b[position]
+                else:
+                    b[position] = rng.choice(alphabet)
+        yield a, ''.join(b)
+
+
+class PythonLevenshteinTest(unittest.TestCase):
+    def test_reference(self):
+        rng = random.Random(0)
+        for min_length, max_length in ((0, 10), (60, 70), (100, 150)):
+            for a, b in _random_pairs(rng, 100, min_length, max_length):
+                for max_distance in (-1, 0, 3, 8):
+                    self.assertEqual(
+                        PythonAlgorithms.levenshtein_distance(a, b, max_distance),
+                        _clamp(_reference_distance(a, b), max_distance), (a, b, max_distance))
+
+
+@unittest.skipIf(algorithms_numba is None, "numba is not available")
+class NumbaLevenshteinTest(unittest.TestCase):
+    def _check_pairs(self, pairs):
+        for a, b in pairs:
+            for max_distance in (-1, 0, 1, 3, 8):
+                expected = PythonAlgorithms.levenshtein_distance(a, b, max_distance)
+                self.assertEqual(algorithms_numba.levenshtein_distance(a, b, max_distance), expected,
+                                 (a, b, max_distance))
+                encoded = algorithms_numba.encode_words([b])
+                self.assertEqual(list(algorithms_numba.levenshtein_distance_batch(a, encoded, max_distance)),
+                                 [expected], (a, b, max_distance))
+
+    def test_bit_parallel(self):
+        self._check_pairs(_random_pairs(random.Random(1), 200, 0, 64))
+
+    def test_two_rows(self):
+        # Shorter string is longer than 64 characters
+        self._check_pairs(_random_pairs(random.Random(2), 100, 65, 120))
+
+    def test_two_rows_cutoff(self):
+        # Minimum of the last rows is under the cutoff, but the distance is not
+        self._check_pairs([("x" * 70 + "abc", "x" * 70 + "defghi"), ("y" * 100 + "a" * 10, "y" * 100 + "b" * 12)])
+
+    def test_unicode(self):
+        self._check_pairs(_random_pairs(random.Random(3), 50, 0, 80, string.ascii_letters + "ёжик🙂"))
+
+    def test_batch(self):
+        rng = random.Random(4)
+        words = [''.join(rng.choice("abc") for _ in range(rng.randint(0, 100))) for _ in range(200)]
+        encoded = algorithms_numba.encode_words(words)
+        for query in ("", "abc", "abcabc" * 15):
+            for max_distance in (-1, 2, 10):
+                self.assertEqual(
+                    list(algorithms_numba.levenshtein_distance_batch(query, encoded, max_distance)),
+                    PythonAlgorithms.levenshtein_distance_batch(query, words, max_distance))
+
+
+if __name__ == "__main__":
+    unittest.main()
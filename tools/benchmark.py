@@ -0,0 +1,327 @@
+import asyncio
+import gc
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import psutil
+import yaml
+
+from src import const
+from src.algorithms import PythonAlgorithms, encode_words, levenshtein_distance, levenshtein_distance_batch
+from src.config import Config, GuildSettings, Reaction, Response, SecretConfig, User, bc
+from src.log import log
+from src.markov import Markov, MarkovNode
+from src.message_buffer import MessageBuffer
+from src.quote import Quote
+from src.reminder import Reminder
+from src.template import SUBCOMMAND_BRACKETS, expand_subcommands
+from src.utils import Util
+
+
+def _random_word(rng, length=8):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_config(args, rng):
+    config = Config()
+    for i in range(1, args.reminders + 1):
+        config.reminders[i] = Reminder("2030-01-01 00:00", _random_word(rng, 32), rng.randint(10 ** 17, 10 ** 18))
+    config.ids["reminder"] = args.reminders + 1
+    for i in range(1, args.quotes + 1):
+        config.quotes[i] = Quote(_random_word(rng, 64), _random_word(rng))
+    config.ids["quote"] = args.quotes + 1
+    for i in range(1, args.reactions + 1):
+        config.reactions[i] = Reaction(_random_word(rng), "👍")
+        config.responses[i] = Response(_random_word(rng), _random_word(rng, 32))
+    config.ids["reaction"] = config.ids["response"] = args.reactions + 1
+    for _ in range(args.users):
+        user = User(rng.randint(10 ** 17, 10 ** 18))
+        user.permission_level = rng.choice((const.Permission.MOD.value, const.Permission.ADMIN.value))
+        config.users[user.id] = user
+    for _ in range(args.guilds):
+        guild = GuildSettings(rng.randint(10 ** 17, 10 ** 18))
+        channels = [rng.randint(10 ** 17, 10 ** 18) for _ in range(10)]
+        guild.whitelist = set(channels[:5])
+        guild.markov_logging_whitelist = set(channels[5:])
+        config.guilds[guild.id] = guild
+    return config
+
+
+def generate_markov(args, rng):
+    markov = Markov()
+    words = list({_random_word(rng, rng.randint(3, 10)) for _ in range(args.markov_nodes)})
+    for word in words:
+        markov.model[word] = MarkovNode(Markov.NodeType.word, word=word)
+    for node in markov.model.values():
+        for _ in range(rng.randint(1, 5)):
+            node.add_next(rng.choice(words))
+        node.add_next(None)
+    return markov
+
+
+def _measure(func, repeat):
+    """Returns best time of several runs and result of the last run"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _yaml_backends():
+    backends = [("python", yaml.Loader, yaml.Dumper)]
+    if hasattr(yaml, "CLoader") and hasattr(yaml, "CDumper"):
+        backends.insert(0, ("c", yaml.CLoader, yaml.CDumper))
+    return backends
+
+
+def bench_persistence(args, rng):
+    config = generate_config(args, rng)
+    markov = generate_markov(args, rng)
+    bc.config = config
+    bc.markov = markov
+    bc.secret_config = SecretConfig()
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            for name, loader, dumper in _yaml_backends():
+                log.info(f"Benchmarking YAML backend: {name}")
+                bc.yaml_dumper = dumper
+                result = results[name] = {}
+                for file, obj in ((const.CONFIG_PATH, config), (const.MARKOV_PATH, markov)):
+                    def save():
+                        with open(file, 'wb') as f:
+                            f.write(Util.dump_config(obj, dumper))
+
+                    def load():
+                        with open(file, 'r') as f:
+                            return yaml.load(f.read(), Loader=loader)
+                    result[file] = {
+                        "save_s": _measure(save, args.repeat)[0],
+                        "load_s": _measure(load, args.repeat)[0],
+                        "bytes": os.path.getsize(file),
+                    }
+                result["Markov.serialize_s"] = _measure(
+                    lambda: markov.serialize(const.MARKOV_PATH, dumper), args.repeat)[0]
+                result["Config.save_s"] = _measure(
+                    lambda: config.save(const.CONFIG_PATH, const.MARKOV_PATH, const.SECRET_CONFIG_PATH, wait=True),
+                    args.repeat)[0]
+                if loader is Util.get_yaml()[0]:
+                    result["Util.read_config_file_s"] = _measure(
+                        lambda: Util.read_config_file(const.CONFIG_PATH), args.repeat)[0]
+            results["backup"] = {}
+            for compress in (True, False):
+                config.saving["backup"]["compress"] = compress
+                backup_dir = os.path.join(tmp_dir, "backup")
+
+                def backup():
+                    for file in os.listdir(backup_dir) if os.path.isdir(backup_dir) else []:
+                        os.remove(os.path.join(backup_dir, file))
+                    config.backup(const.CONFIG_PATH, const.MARKOV_PATH)
+                elapsed = _measure(backup, args.repeat)[0]
+                results["backup"]["deflated" if compress else "stored"] = {
+                    "time_s": elapsed,
+                    "bytes": sum(os.path.getsize(os.path.join(backup_dir, file)) for file in os.listdir(backup_dir)),
+                }
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def generate_subcommands(args, rng):
+    brackets = list(SUBCOMMAND_BRACKETS.items())
+    nested = "x"
+    for _ in range(args.subcommand_depth):
+        opening, closing = rng.choice(brackets)
+        nested = f"${opening}echo {nested}{closing}"
+    flat = ' '.join(f"{_random_word(rng)} $(echo {_random_word(rng)})" for _ in range(args.subcommand_count))
+    return {
+        "nested": nested,
+        "flat": flat,
+        "plain": _random_word(rng, len(flat)),
+    }
+
+
+def bench_subcommands(args, rng):
+    async def execute(subcommand):
+        return subcommand.split(' ', 1)[-1]
+
+    results = {}
+    for name, content in generate_subcommands(args, rng).items():
+        results[name] = {
+            "length": len(content),
+            "expand_s": _measure(lambda: asyncio.run(expand_subcommands(content, execute)), args.repeat)[0],
+        }
+    return results
+
+
+def bench_levenshtein(args, rng):
+    queries = [_random_word(rng, rng.randint(3, 12)) for _ in range(args.levenshtein_queries)]
+    vocabularies = {
+        "commands": [_random_word(rng, rng.randint(2, 12)) for _ in range(args.levenshtein_commands)],
+        "markov": [_random_word(rng, rng.randint(1, 15)) for _ in range(args.markov_nodes)],
+    }
+    levenshtein_distance_matrix = importlib.import_module("src.algorithms_numba").levenshtein_distance_matrix
+    # Compile all functions before measuring
+    levenshtein_distance_matrix("", "")
+    levenshtein_distance("", "")
+    levenshtein_distance_batch("", encode_words([""]))
+    results = {}
+    for name, words in vocabularies.items():
+        log.info(f"Benchmarking Levenshtein distance: {name} ({len(words)} words)")
+        encoded_words = encode_words(words)
+        result = results[name] = {"words": len(words), "queries": len(queries)}
+        result["matrix_s"] = _measure(
+            lambda: [levenshtein_distance_matrix(q, w) for q in queries for w in words], args.repeat)[0]
+        result["pairwise_s"] = _measure(
+            lambda: [levenshtein_distance(q, w) for q in queries for w in words], args.repeat)[0]
+        result["pairwise_max_distance_s"] = _measure(
+            lambda: [levenshtein_distance(q, w, args.max_distance) for q in queries for w in words], args.repeat)[0]
+        result["batch_s"] = _measure(
+            lambda: [levenshtein_distance_batch(q, encoded_words) for q in queries], args.repeat)[0]
+        result["batch_max_distance_s"] = _measure(
+            lambda: [levenshtein_distance_batch(q, encoded_words, args.max_distance) for q in queries],
+            args.repeat)[0]
+        result["encode_words_s"] = _measure(lambda: encode_words(words), args.repeat)[0]
+        result["python_batch_max_distance_s"] = _measure(
+            lambda: [PythonAlgorithms.levenshtein_distance_batch(q, words, args.max_distance) for q in queries],
+            args.repeat)[0]
+    return results
+
+
+def _guild_payload(guild_id, channels):
+    return {
+        "id": str(guild_id),
+        "name": f"guild{guild_id}",
+        "owner_id": "1",
+        "member_count": 1000,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "104324161", "position": 0}],
+        "channels": [
+            {"id": str(channel_id), "type": 0, "name": f"channel{channel_id}", "position": i,
+             "permission_overwrites": []}
+            for i, channel_id in enumerate(channels)
+        ],
+        "emojis": [],
+        "members": [],
+        "features": [],
+    }
+
+
+def _message_payload(rng, message_id, guild_id, channel_id):
+    author_id = rng.randint(10 ** 17, 10 ** 18)
+    return {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "guild_id": str(guild_id),
+        "author": {"id": str(author_id), "username": _random_word(rng), "discriminator": "0001", "avatar": None},
+        "member": {"roles": [], "joined_at": "2021-01-01T00:00:00+00:00", "deaf": False, "mute": False},
+        "content": ' '.join(_random_word(rng, rng.randint(2, 10)) for _ in range(rng.randint(1, 20))),
+        "timestamp": "2021-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def _client_memory(lean, trace, args):
+    """Feed synthetic guilds and messages to discord client state (with MessageBuffer that is populated by
+    on_message like in WalBot) and measure memory. Runs in separate process, so RSS of modes is not mixed"""
+    import discord.state
+    rng = random.Random(args.seed)
+    buffer = MessageBuffer()
+
+    def dispatch(event, *args):
+        if event == "message":
+            buffer.push(args[0])
+    rss = psutil.Process().memory_info().rss
+    if trace:
+        tracemalloc.start()
+    state = discord.state.ConnectionState(
+        dispatch=dispatch, handlers={}, hooks={}, syncer=None, http=None, loop=None,
+        **Util.get_discord_client_options(lean))
+    channels = []
+    for _ in range(args.client_guilds):
+        guild_id = rng.randint(10 ** 17, 10 ** 18)
+        guild_channels = [rng.randint(10 ** 17, 10 ** 18) for _ in range(args.client_channels)]
+        state._add_guild_from_data(_guild_payload(guild_id, guild_channels))
+        channels.extend((guild_id, channel_id) for channel_id in guild_channels)
+    message_id = 10 ** 17
+    for _ in range(args.client_messages):
+        for guild_id, channel_id in channels:
+            message_id += 1
+            state.parse_message_create(_message_payload(rng, message_id, guild_id, channel_id))
+    gc.collect()
+    result = {
+        "client_cached_messages": len(state._messages or ()),
+        "buffered_messages": len(buffer),
+        "buffer_bytes": buffer.memory_usage(),
+    }
+    if trace:
+        result["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        result["rss_bytes"] = psutil.Process().memory_info().rss - rss
+    return result
+
+
+def bench_client(args, rng):
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name, lean in (("default", False), ("lean", True)):
+        log.info(f"Benchmarking discord client memory: {name}")
+        result = results[name] = {}
+        # RSS is measured without tracemalloc, because tracing adds its own memory overhead
+        for trace in (False, True):
+            with context.Pool(1) as pool:
+                result.update(pool.apply(_client_memory, (lean, trace, args)))
+    results["rss_reduction_bytes"] = results["default"]["rss_bytes"] - results["lean"]["rss_bytes"]
+    results["traced_reduction_bytes"] = results["default"]["traced_bytes"] - results["lean"]["traced_bytes"]
+    return results
+
+
+SUITES = {
+    "persistence": bench_persistence,
+    "subcommands": bench_subcommands,
+    "levenshtein": bench_levenshtein,
+    "client": bench_client,
+}
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    suites = SUITES.keys() if args.suite == "all" else [args.suite]
+    report = {
+        "python": sys.version.split()[0],
+        "yaml": yaml.__version__,
+        "params": {key: value for key, value in vars(args).items() if key not in ("action", "out_file")},
+        "results": {},
+    }
+    for suite in suites:
+        log.info(f"Running benchmark suite: {suite}")
+        report["results"][suite] = SUITES[suite](args, rng)
+    output = json.dumps(report, indent=2)
+    if args.out_file:
+        with open(args.out_file, 'w') as f:
+            f.write(output + '\n')
+        log.info(f"Benchmark results are saved to {args.out_file}")
+    else:
+        print(output)
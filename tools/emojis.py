@@ -0,0 +1,41 @@
+import http.client
+import os
+import sys
+import urllib.request
+
+from src import const
+from src.emoji_index import parse_emoji_chart, write_emoji_index
+from src.log import log
+
+
+def read_source(source, timeout=const.EMOJI_CHART_TIMEOUT):
+    if os.path.isfile(source):
+        log.info(f"Reading emoji chart from {source}")
+        with open(source, 'rb') as f:
+            return f.read().decode("utf-8")
+    log.info(f"Downloading emoji chart from {source}")
+    rq = urllib.request.Request(source, headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(rq, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+def build(source, out_file):
+    """Build emoji index from emoji chart. Returns False if index could not be built"""
+    try:
+        page = read_source(source)
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        log.error(f"Failed to read emoji chart: {e}")
+        return False
+    images = parse_emoji_chart(page)
+    if not images:
+        log.error("No emoji images were found in emoji chart")
+        return False
+    write_emoji_index(out_file, images)
+    log.info(f"Emoji index with {len(images)} emojis is saved to {out_file} "
+             f"({os.path.getsize(out_file)} bytes)")
+    return True
+
+
+def main(args):
+    if not build(args.source, args.out_file):
+        sys.exit(1)
@@ -1,10 +1,8 @@
 import os
-import shutil
 import sys
 
-import yaml
-
 from src.log import log
+from src.patch.toplevel import FullLoadRequired, TopLevelConfig, replace_with_backup
 from src.patch.updater import Updater
 from src.utils import Util
 
@@ -12,25 +10,50 @@ from src.utils import Util
 def save_file(path, config):
     _, yaml_dumper = Util.get_yaml()
     with open(path, 'wb') as f:
-        f.write(yaml.dump(config, Dumper=yaml_dumper, encoding='utf-8', allow_unicode=True))
+        f.write(Util.dump_config(config, yaml_dumper))
+
+
+def patch_top_level(file, version):
+    """Apply patches that touch only top-level fields without loading the whole file"""
+    config = TopLevelConfig(file)
+    if not Updater(file, config).result():
+        return config.version
+    config.save(file + ".new")
+    replace_with_backup(file, file + ".new", os.path.join("backup", file + ".bak." + version))
+    return config.version
+
+
+def patch_full(file, version):
+    config = Util.read_config_file(file, legacy=True)
+    if config is None:
+        log.error(f"File '{file}' can not be read")
+        sys.exit(1)
+    if not Updater(file, config).result():
+        return config.version
+    save_file(file + ".new", config)
+    replace_with_backup(file, file + ".new", os.path.join("backup", file + ".bak." + version))
+    return config.version
 
 
 def main(args, files):
     if args.file != "all":
         files = [args.file]
     for file in files:
-        config = Util.read_config_file(file)
-        if config is None:
+        if not os.path.isfile(file):
             log.error(f"File '{file}' does not exist")
             sys.exit(1)
-        if not hasattr(config, "version"):
+        version = Util.read_config_version(file)
+        if version is None:
             log.error(f"{file} does not have 'version' field")
             sys.exit(1)
-        version = config.version
         log.info(f"WalBot config patch tool: {file}@{version}")
-        if Updater(file, config).result():
-            if not os.path.exists("backup"):
-                os.makedirs("backup")
-            shutil.copyfile(file, "backup/" + file + ".bak." + version)
-            save_file(file, config)
-            log.info(f"Successfully saved file: {config.version}")
+        if Updater.is_up_to_date(file, version):
+            log.info(f"Version of {file} is up to date!")
+            continue
+        try:
+            new_version = patch_top_level(file, version)
+        except FullLoadRequired as e:
+            log.info(f"Patch for {file} requires loading of the whole file ('{e}' field is affected)")
+            new_version = patch_full(file, version)
+        if new_version != version:
+            log.info(f"Successfully saved file: {new_version}")
@@ -10,9 +10,9 @@ import sys
 
 def main():
     """WalBot launcher entrypoint"""
-    if not ((sys.version_info.major == 3 and sys.version_info.minor >= 6) and
+    if not ((sys.version_info.major == 3 and sys.version_info.minor >= 7) and
             (sys.version_info.major == 3 and sys.version_info.minor <= 8)):
-        print("Python {}.{}.{} is not supported. You need Python 3.6 - 3.8".format(
+        print("Python {}.{}.{} is not supported. You need Python 3.7 - 3.8".format(
             sys.version_info.major, sys.version_info.minor, sys.version_info.micro))
         sys.exit(1)
     importlib.import_module("src.launcher").Launcher()